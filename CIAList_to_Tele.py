@@ -1,73 +1,88 @@
 import os
+import sys
 import json
 import pytz
-import requests
 import gspread
 from datetime import datetime
-from oauth2client.service_account import ServiceAccountCredentials
 from dotenv import load_dotenv
-from datetime import datetime, timedelta
+from gspread.utils import absolute_range_name
+from sheet_sync import read_columns, row_hash
+from shared_clients import open_spreadsheet
+from telegram_delivery import chat_ids, pack_table
+from telegram_outbox import Outbox, drain
+import metrics
 # ------------------ LOAD ENV ------------------
 load_dotenv()
 
-SERVICE_ACCOUNT_JSON = os.getenv("GOOGLE_SHEETS_CREDENTIALS")
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_IDS = os.getenv("TELEGRAM_CHAT_IDS")
 
-if not all([SERVICE_ACCOUNT_JSON, TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_IDS]):
-    print("❌ Missing required environment variables. Exiting.")
-    exit()
-
-try:
-    service_account_info = json.loads(SERVICE_ACCOUNT_JSON)
-except json.JSONDecodeError as e:
-    print(f"❌ Failed to parse GOOGLE_SHEETS_CREDENTIALS JSON: {str(e)}")
-    exit()
-
 # ------------------ GOOGLE SHEETS ------------------
-scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-creds = ServiceAccountCredentials.from_json_keyfile_dict(service_account_info, scope)
-client = gspread.authorize(creds)
-
 GSHEET_ID = "1hKjtvDZJjYLH5G5E3bfe5hqSoeG-XK-u1yPaSPmrkus"
 TAB_NAME = "filter"
 
-try:
-    worksheet = client.open_by_key(GSHEET_ID).worksheet(TAB_NAME)
-except gspread.exceptions.WorksheetNotFound:
-    print(f"❌ Worksheet '{TAB_NAME}' not found in spreadsheet.")
-    exit()
-except gspread.exceptions.SpreadsheetNotFound:
-    print(f"❌ Spreadsheet with ID '{GSHEET_ID}' not found.")
-    exit()
-
 COLUMNS_TO_SEND = ['A', 'E', 'G', 'H', 'K','BT']
 HEADERS = ["Timestamp", "Close", "Symbol", "ST", "Power"]
 MAX_COL_WIDTH = 20  # Cap column width to reduce padding
+FIRST_DATA_ROW = 2  # Row 1 is the header
+REPORT_NAME = "cialist"  # Outbox idempotency key prefix
 
-# Fetch column values
-def get_column_values(worksheet, col_letter):
-    try:
-        col_index = gspread.utils.a1_to_rowcol(f"{col_letter}1")[1]
-        return worksheet.col_values(col_index)[1:]  # skip header
-    except Exception as e:
-        print(f"❌ Error fetching column {col_letter}: {str(e)}")
-        return []
+# Where the last scan stopped, so each run only reads the rows below it
+CURSOR_FILE = os.getenv("CIALIST_CURSOR_FILE", ".cache/cialist_cursor.json")
 
-columns_data = [get_column_values(worksheet, col) for col in COLUMNS_TO_SEND]
-rows = list(zip(*columns_data))
+# Fetch all needed columns (from start_row down) in one batched read
+def get_columns(spreadsheet, col_letters, start_row=FIRST_DATA_ROW):
+    ranges = [absolute_range_name(TAB_NAME, f"{col}{start_row}:{col}") for col in col_letters]
+    return read_columns(spreadsheet, ranges)
+
+# ------------------ ROW CURSOR ------------------
+def load_cursor(path=CURSOR_FILE):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_cursor(cursor, path=CURSOR_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(cursor, f, indent=1)
+
+@metrics.timed()
+def read_rows(spreadsheet, cursor):
+    """(sheet row of rows[0], rows) starting at the cursor's anchor row.
+
+    The anchor is the last row dated before the previous run's day; its
+    timestamp is re-read and compared, and any mismatch (rows deleted or
+    re-sorted above it) falls back to a full scan.
+    """
+    anchor = cursor.get("row")
+    if anchor and anchor >= FIRST_DATA_ROW:
+        rows = list(zip(*get_columns(spreadsheet, COLUMNS_TO_SEND, anchor)))
+        if rows and rows[0][0] == cursor.get("timestamp"):
+            print(f"📍 Resuming from row {anchor} ({len(rows) - 1} rows below it)")
+            return anchor, rows
+        print("⚠️ Sheet changed above the saved cursor; scanning from the top")
+    return FIRST_DATA_ROW, list(zip(*get_columns(spreadsheet, COLUMNS_TO_SEND)))
+
+def advance_cursor(cursor, first_row, rows, today_str):
+    """Move the anchor to the last row dated before today (rows are appended in time order)."""
+    for offset in range(len(rows) - 1, -1, -1):
+        timestamp = str(rows[offset][0])
+        if timestamp and timestamp[:10] < today_str:
+            cursor["row"], cursor["timestamp"] = first_row + offset, timestamp
+            break
+    return cursor
 
 # ------------------ FILTER TODAY & BT=TRUE ------------------
-tz = pytz.timezone("Asia/Kolkata")
-today_str = datetime.now(tz).strftime("%Y-%m-%d")
-# Yesterday
-#today_str = (datetime.now(tz) - timedelta(days=1)).strftime("%Y-%m-%d")
-filtered_rows = []
-for row in rows:
-    *data, bt = row  # unpack: all data except last, then bt separately
-    timestamp = data[0]
-    if timestamp.startswith(today_str) and bt.strip().upper() == "TRUE":
-        filtered_rows.append(data)   # only keep data (exclude BT)
+def filter_rows(rows, today_str):
+    filtered_rows = []
+    for row in rows:
+        *data, bt = row  # unpack: all data except last, then bt separately
+        timestamp = data[0]
+        if timestamp.startswith(today_str) and bt.strip().upper() == "TRUE":
+            filtered_rows.append(data)   # only keep data (exclude BT)
+    return filtered_rows
 
 # ------------------ FORMAT AS TABULAR TEXT ------------------
 def escape_markdown_v2(text):
@@ -76,42 +91,25 @@ def escape_markdown_v2(text):
         text = text.replace(char, f"\\{char}")
     return text
 
-def send_telegram_message(text, chat_id, token):
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    max_length = 4000  # Slightly below 4096 to account for Markdown
-    if len(text) <= max_length:
-        payload = {"chat_id": chat_id, "text": f"```\n{text}\n```", "parse_mode": "MarkdownV2"}
-        response = requests.post(url, data=payload)
-        if response.status_code == 200:
-            print("✅ Message sent successfully")
-        else:
-            print(f"❌ Failed to send message: {response.text}")
-        return response.status_code == 200
-    else:
-        # Split into chunks based on estimated row length
-        lines = text.split("\n")
-        header_lines = lines[:2]  # Header and separator
-        data_lines = lines[2:]
-        # Estimate average row length (including separators)
-        avg_row_length = sum(len(line) for line in data_lines[:10]) / max(len(data_lines[:10]), 1) if data_lines else 1
-        chunk_size = max(1, int((max_length - len("\n".join(header_lines))) / max(avg_row_length, 1)))
-        print(f"📏 Estimated chunk size: {chunk_size} rows (avg row length: {avg_row_length:.1f} chars)")
-        
-        for i in range(0, len(data_lines), chunk_size):
-            chunk_lines = header_lines + data_lines[i:i + chunk_size]
-            chunk_text = "\n".join(chunk_lines)
-            print(f"📤 Sending chunk {i//chunk_size + 1} with {len(chunk_lines)-2} rows ({len(chunk_text)} chars)")
-            payload = {"chat_id": chat_id, "text": f"```\n{chunk_text}\n```", "parse_mode": "MarkdownV2"}
-            response = requests.post(url, data=payload)
-            if response.status_code != 200:
-                print(f"❌ Failed to send chunk {i//chunk_size + 1}: {response.text}")
-                return False
-        print(f"✅ Sent {len(data_lines)//chunk_size + 1} message chunks")
-        return True
+@metrics.timed()
+def send_telegram_message(text, chat_ids_value, token, date, drain_now=True):
+    """Queue a table (or note) for every chat in TELEGRAM_CHAT_IDS, split into exact-size chunks.
+
+    The outbox key covers the report date and content, so a rerun with the
+    same table sends nothing new. Returns True once queued (and, with
+    drain_now, delivered).
+    """
+    chats = chat_ids(chat_ids_value)
+    chunks = pack_table(text)
+    with Outbox() as outbox:
+        queued = outbox.enqueue_texts(REPORT_NAME, date, chats, chunks, parse_mode="MarkdownV2")
+    print(f"📤 Queued {queued} new message(s): {len(chunks)} chunk(s) of up to "
+          f"{max(len(c) for c in chunks)} chars for {len(chats)} chat(s)")
+    return drain(token) if drain_now else True
 
 # ------------------ FORMAT AS TABULAR TEXT ------------------
-# ------------------ FORMAT AS TABULAR TEXT ------------------
-if filtered_rows:
+@metrics.timed()
+def format_table(filtered_rows):
     # Auto-adjust column widths based on data length (with safe cap)
     col_widths = []
     for i in range(len(HEADERS)):
@@ -142,11 +140,57 @@ if filtered_rows:
             line_values.append(escape_markdown_v2(val_str).ljust(col_widths[i]))
         row_lines.append(" | ".join(line_values))
 
-    table_text = "\n".join([header_line, separator] + row_lines)
-    print(f"📊 Total table size: {len(table_text)} characters, {len(filtered_rows)} rows")
+    return "\n".join([header_line, separator] + row_lines)
 
-    send_telegram_message(table_text, TELEGRAM_CHAT_IDS, TELEGRAM_BOT_TOKEN)
-else:
-    send_telegram_message("No rows found for today with BT=TRUE", TELEGRAM_CHAT_IDS, TELEGRAM_BOT_TOKEN)
-    print("No rows found for today with BT=TRUE")
+def main(new_only=False, drain_now=True):
+    if not all([os.getenv("GOOGLE_SHEETS_CREDENTIALS"), TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_IDS]):
+        print("❌ Missing required environment variables. Exiting.")
+        return
 
+    cursor = load_cursor()
+    try:
+        first_row, rows = read_rows(open_spreadsheet(GSHEET_ID), cursor)
+    except gspread.exceptions.SpreadsheetNotFound:
+        print(f"❌ Spreadsheet with ID '{GSHEET_ID}' not found.")
+        return
+    except gspread.exceptions.APIError as e:
+        print(f"❌ Could not read columns {COLUMNS_TO_SEND} from worksheet '{TAB_NAME}': {str(e)}")
+        return
+    except ValueError as e:
+        print(f"❌ Failed to parse GOOGLE_SHEETS_CREDENTIALS JSON: {str(e)}")
+        return
+
+    tz = pytz.timezone("Asia/Kolkata")
+    today_str = datetime.now(tz).strftime("%Y-%m-%d")
+    # Yesterday
+    #today_str = (datetime.now(tz) - timedelta(days=1)).strftime("%Y-%m-%d")
+    filtered_rows = filter_rows(rows, today_str)
+
+    # Rows already delivered today (kept per day in the cursor file)
+    delivered = cursor.get("delivered", {})
+    sent_keys = set(delivered.get("keys", [])) if delivered.get("date") == today_str else set()
+    if new_only:
+        filtered_rows = [row for row in filtered_rows if row_hash(row) not in sent_keys]
+
+    if filtered_rows:
+        table_text = format_table(filtered_rows)
+        print(f"📊 Total table size: {len(table_text)} characters, {len(filtered_rows)} rows")
+
+        if send_telegram_message(table_text, TELEGRAM_CHAT_IDS, TELEGRAM_BOT_TOKEN, today_str, drain_now):
+            sent_keys.update(row_hash(row) for row in filtered_rows)
+    elif new_only:
+        print("No new rows for today with BT=TRUE since the last run")
+    else:
+        send_telegram_message("No rows found for today with BT=TRUE", TELEGRAM_CHAT_IDS, TELEGRAM_BOT_TOKEN,
+                              today_str, drain_now)
+        print("No rows found for today with BT=TRUE")
+
+    cursor["delivered"] = {"date": today_str, "keys": sorted(sent_keys)}
+    save_cursor(advance_cursor(cursor, first_row, rows, today_str))
+
+if __name__ == "__main__":
+    # --new-only sends just the rows not delivered by an earlier run today;
+    # --enqueue-only leaves delivery to `python telegram_outbox.py drain`
+    main(new_only="--new-only" in sys.argv[1:] or os.getenv("CIALIST_NEW_ONLY") == "1",
+         drain_now="--enqueue-only" not in sys.argv[1:])
+    metrics.write_report("cialist")
@@ -1,14 +1,20 @@
-import io
-import json
+import asyncio
+import multiprocessing
 import os
+from contextlib import nullcontext
+import sys
 import pandas as pd
-import requests
-from bs4 import BeautifulSoup
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
 import calendar
-import time
-import gspread
-from google.oauth2.service_account import Credentials
+from archive_cache import ArchiveCache, fetch_cached
+from nse_downloader import ArchiveDownloader, TokenBucket
+from nsdl_parser import parse_sector_table
+from sector_store import SectorReportStore
+from nsdl_resolver import ReportResolver
+from sheet_sync import sync_dataframe, describe
+from shared_clients import open_spreadsheet
+import metrics
 
 # =========================
 # CONFIG
@@ -16,146 +22,43 @@ from google.oauth2.service_account import Credentials
 SHEET_ID = "1IUChF0UFKMqVLxTI69lXBi-g48f-oTYqI1K9miipKgY"
 TAB_NAME = "FPI_Sectors"
 
-# =========================
-# GOOGLE SHEETS AUTH
-# =========================
-credentials_json = os.getenv("GOOGLE_SHEETS_CREDENTIALS")
-if not credentials_json:
-    raise ValueError("GOOGLE_SHEETS_CREDENTIALS environment variable not set!")
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+}
+
+# NSDL does not revise a fortnight's page once the next two are out
+IMMUTABLE_AFTER_DAYS = 35
+archive_cache = ArchiveCache()
 
-creds = Credentials.from_service_account_info(
-    json.loads(credentials_json),
-    scopes=["https://www.googleapis.com/auth/spreadsheets"]
-)
-client = gspread.authorize(creds)
+# Politeness towards NSDL as a rate (requests/sec) with a small burst, not a fixed sleep
+NSDL_RATE = float(os.getenv("NSDL_RATE", "0.8"))
+NSDL_BURST = int(os.getenv("NSDL_BURST", "2"))
+NSDL_MAX_IN_FLIGHT = 4
+PARSE_WORKERS = int(os.getenv("FPI_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# A page parses in ~10 ms but a spawned worker takes ~1 s to start, so only
+# backfills of at least this many pages are parsed in worker processes
+PARSE_PROCESS_MIN_REPORTS = int(os.getenv("FPI_PARSE_PROCESS_MIN_REPORTS", "50"))
 
 # ================== EXTRACTION FUNCTION (AUC + NET) ==================
+def is_immutable(report_date):
+    return datetime.now() - report_date > timedelta(days=IMMUTABLE_AFTER_DAYS)
+
+@metrics.timed()
 def extract_latest_auc(url, report_date):
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-    }
     try:
-        response = requests.get(url, headers=headers, timeout=20)
-        response.raise_for_status()
+        content = fetch_cached(url, archive_cache, headers=HEADERS, timeout=20, immutable=is_immutable(report_date))
     except Exception as e:
         print(f"Failed to fetch {url}: {e}")
         return None
+    return parse_report(content, report_date, url)
 
-    soup = BeautifulSoup(response.content, "html.parser")
-    table = soup.find("table")
-    if not table:
-        print(f"No table found on {url}")
-        return None
-
-    html_stream = io.StringIO(str(table))
-    df = pd.read_html(html_stream, header=None)[0]
-
-    data_start_idx = None
-    for idx, row in df.iterrows():
-        val = str(row.iloc[0]).strip()
-        if val in ["1", "1.0"]:
-            data_start_idx = idx
-            break
-
-    if data_start_idx is None:
-        print("Could not find data rows")
-        return None
-
-    header_rows = df.iloc[:data_start_idx]
-    data_rows = df.iloc[data_start_idx:].copy()
-
-    target_str = f"AUC as on {report_date.strftime('%B %d, %Y')}".lower()
-    
-    columns_to_keep = [0, 1]
-    final_cols = ["Sr_No", "Sector"]
-    equity_count = 0
-    total_count = 0
-
-    # For Net Investment (collecting all matches to slice by position later)
-    net_columns_to_keep = [0, 1]
-    net_final_cols = ["Sr_No", "Sector"]
-
-    for col_idx in range(2, len(df.columns)):
-        col_text = " ".join(header_rows[col_idx].dropna().astype(str).tolist()).lower()
-      
-        # AUC
-        if target_str in col_text and "inr" in col_text and "usd" not in col_text:
-            columns_to_keep.append(col_idx)
-            if "equity" in col_text:
-                equity_count += 1
-                final_cols.append("AUC_Equity_Cr" if equity_count == 1 else f"AUC_Equity_Cr_{equity_count}")
-            elif "total" in col_text:
-                total_count += 1
-                final_cols.append("AUC_Total_Cr" if total_count == 1 else f"AUC_Total_Cr_{total_count}")
-            else:
-                final_cols.append(f"AUC_Col_{col_idx}")
-
-        # Net Investment (Collects all matching columns dynamically)
-        if ("net investment" in col_text or "net inv" in col_text) and "inr" in col_text and "usd" not in col_text:
-            net_columns_to_keep.append(col_idx)
-            if "equity" in col_text:
-                net_final_cols.append("Net_Equity_Cr")
-            elif "total" in col_text:
-                net_final_cols.append("Net_Total_Cr")
-            else:
-                net_final_cols.append(f"Net_Col_{col_idx}")
-
-    # AUC DataFrame
-    auc_df = data_rows[columns_to_keep].copy()
-    auc_df.columns = final_cols[:len(auc_df.columns)]
-
-    # Net Investment DataFrame (Handles positional filtering to keep correct data)
-    net_df = data_rows[net_columns_to_keep].copy()
-    net_df.columns = net_final_cols[:len(net_df.columns)]
-
-    # Clean row elements
-    for d in [auc_df, net_df]:
-        d = d[d["Sector"].notna()]
-        d = d[~d["Sector"].str.contains("Sectors|Total|Grand Total", case=False, na=False)]
-        d.reset_index(drop=True, inplace=True)
-
-    # --- POSITION FILTER FOR DUPLICATE NET COLUMNS ---
-    # Tracks positions of all matching strings to precisely slice out the older fortnight data
-    equity_indices = [i for i, col in enumerate(net_df.columns) if col == 'Net_Equity_Cr']
-    total_indices = [i for i, col in enumerate(net_df.columns) if col == 'Net_Total_Cr']
-
-    net_cols_mask = []
-    for i, col in enumerate(net_df.columns):
-        if col == 'Net_Equity_Cr':
-            # Keep the 3rd Equity column found (corresponds to latest fortnight)
-            if len(equity_indices) >= 3 and i == equity_indices[2]:
-                net_cols_mask.append(True)
-            elif len(equity_indices) < 3 and i == equity_indices[0]:
-                net_cols_mask.append(True)
-            else:
-                net_cols_mask.append(False)
-        elif col == 'Net_Total_Cr':
-            # Keep the 2nd Total column found (corresponds to latest fortnight)
-            if len(total_indices) >= 2 and i == total_indices[1]:
-                net_cols_mask.append(True)
-            elif len(total_indices) < 2 and i == total_indices[0]:
-                net_cols_mask.append(True)
-            else:
-                net_cols_mask.append(False)
-        else:
-            net_cols_mask.append(True)
-
-    # Apply positional mask to drop the undesired redundant columns
-    net_df = net_df.loc[:, net_cols_mask]
-
-    auc_df["Report_Date"] = report_date.strftime("%Y-%m-%d")
-    net_df["Report_Date"] = report_date.strftime("%Y-%m-%d")
-
-    # Merge AUC + Net
-    final_df = pd.merge(auc_df, net_df.drop(columns=['Sr_No'], errors='ignore'),
-                        on=['Report_Date', 'Sector'], how='left')
-    return final_df
+def parse_report(content, report_date, url=""):
+    df = parse_sector_table(content, report_date)
+    if df is None:
+        print(f"No sector table found on {url}")
+    return df
 
 # ================== HELPERS ==================
-def get_nsdl_month_name(dt):
-    full = dt.strftime("%B")
-    return full if full in ["June", "July"] else dt.strftime("%b")
-
 def generate_dates_last_12_months():
     dates = []
     today = datetime.now()
@@ -171,38 +74,74 @@ def generate_dates_last_12_months():
             current = current.replace(month=current.month-1, day=1)
     return sorted(set(dates), reverse=True)[:26]
 
+# ================== CONCURRENT FETCH ==================
+@metrics.timed()
+async def fetch_reports(reports):
+    """Download (report_date, url) pairs concurrently under the NSDL rate limit and parse them.
+
+    Large backfills are parsed in worker processes; everything else inline.
+
+    Returns one frame per report, in order, with None for failed ones.
+    """
+    limiter = TokenBucket(NSDL_RATE, NSDL_BURST)
+    loop = asyncio.get_running_loop()
+
+    # Spawn rather than fork: run_pipeline runs this next to other jobs' threads,
+    # and a forked child can inherit a lock one of them was holding
+    use_pool = len(reports) >= PARSE_PROCESS_MIN_REPORTS and PARSE_WORKERS > 1
+    with (ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+          if use_pool else nullcontext()) as pool:
+        async with ArchiveDownloader(HEADERS, max_in_flight=NSDL_MAX_IN_FLIGHT, timeout=20,
+                                     cache=archive_cache, limiter=limiter) as downloader:
+            async def fetch_one(report_date, url):
+                content = await downloader.get(url, label=report_date.strftime('%Y-%m-%d'),
+                                               immutable=is_immutable(report_date))
+                if content is None:
+                    print(f" ✗ Failed: {report_date.strftime('%Y-%m-%d')}")
+                    return None
+                # Worker-process parses are timed from here
+                with metrics.stage("parse_report"):
+                    if pool is None:
+                        df = parse_report(content, report_date, url)
+                    else:
+                        df = await loop.run_in_executor(pool, parse_report, content, report_date, url)
+                if df is not None and not df.empty:
+                    print(f" ✓ Success: {report_date.strftime('%Y-%m-%d')} → {len(df)} sectors")
+                    return df
+                print(f" ✗ Failed: {report_date.strftime('%Y-%m-%d')}")
+                return None
+
+            results = await asyncio.gather(*(fetch_one(d, url) for d, url in reports))
+        print(f"Downloads: {downloader.summary()}")
+    return results
+
 # ================== MAIN ==================
-if __name__ == "__main__":
+def main(full=False):
     print("Starting FII AUC + Net Investment Downloader → Google Sheets...\n")
-    report_dates = generate_dates_last_12_months()
-  
-    all_data = []
-    base_url = "https://www.fpi.nsdl.co.in/web/StaticReports/Fortnightly_Sector_wise_FII_Investment_Data/FIIInvestSector_{}.html"
-   
-    for report_date in report_dates:
-        month_str = get_nsdl_month_name(report_date)
-        day_str = f"{report_date.day:02d}"
-        filename = f"{month_str}{day_str}{report_date.year}"
-        url = base_url.format(filename)
-      
-        print(f"Fetching: {report_date.strftime('%Y-%m-%d')} → {filename}")
-        df = extract_latest_auc(url, report_date)
-      
-        if df is not None and not df.empty:
-            all_data.append(df)
-            print(f" ✓ Success: {len(df)} sectors")
-        else:
-            print(" ✗ Failed")
-        time.sleep(1.2)
-
-    if all_data:
-        final_df = pd.concat(all_data, ignore_index=True)
-      
+    # Map each nominal fortnight to the file NSDL actually published
+    resolved = ReportResolver().resolve(generate_dates_last_12_months())
+    reports = sorted(resolved.values(), reverse=True)
+    report_dates = [d for d, _ in reports]
+    store = SectorReportStore()
+
+    # Parsed fortnights are final once immutable; only fetch the rest
+    to_fetch = [(d, url) for d, url in reports if full or d not in store or not is_immutable(d)]
+    print(f"{len(reports) - len(to_fetch)} fortnight(s) from {store.root}, {len(to_fetch)} to fetch")
+
+    if to_fetch:
+        for (report_date, _), df in zip(to_fetch, asyncio.run(fetch_reports(to_fetch))):
+            if df is not None:
+                store.put(report_date, df)
+        print(f"Cache: {archive_cache.summary()}")
+        archive_cache.evict()
+
+    final_df = store.read(report_dates)
+    if not final_df.empty:
         # Explicit column structure strategy & renaming alignment
         desired_cols = ["Report_Date", "Sector", "AUC_Equity_Cr", "AUC_Total_Cr",
                         "Net_Equity_Cr", "Net_Total_Cr"]
         final_df = final_df[[col for col in desired_cols if col in final_df.columns]]
-      
+
         # --- RENAME COLUMNS ---
         # Net_Equity_Cr -> Net_Investment_Cr
         # Net_Total_Cr  -> Total_Investment_cr
@@ -219,18 +158,24 @@ if __name__ == "__main__":
 
         # Save to Google Sheets
         try:
-            sheet = client.open_by_key(SHEET_ID)
+            sheet = open_spreadsheet(SHEET_ID)
             worksheet = sheet.worksheet(TAB_NAME)
-            worksheet.clear()
-            worksheet.update([final_df.columns.values.tolist()] + final_df.values.tolist())
-          
-            print(f"\n✅ SUCCESS! Data uploaded to Google Sheet")
+            with metrics.stage("upload"):
+                report = sync_dataframe(worksheet, final_df, key_columns=["Report_Date", "Sector"])
+
+            print(f"\n✅ SUCCESS! Data uploaded to Google Sheet ({describe(report)})")
             print(f"Sheet ID: {SHEET_ID} | Tab: {TAB_NAME}")
             print(f"Total Rows: {len(final_df)}")
-          
+
         except Exception as e:
             print(f"Google Sheets upload failed: {e}")
             final_df.to_csv("fii_auc_sector_last_12months.csv", index=False)
             print("Saved to CSV backup.")
     else:
         print("No data collected.")
+
+
+if __name__ == "__main__":
+    # --full re-fetches and re-parses every fortnight instead of only new ones
+    main(full="--full" in sys.argv[1:])
+    metrics.write_report("fpi_sectors")
@@ -1,12 +1,15 @@
-import json 
+import asyncio
 import os
+import random
+import sys
 from datetime import datetime, timedelta
 import pandas as pd
-import requests
-import gspread
-from google.oauth2.service_account import Credentials
 from curl_cffi import requests
-import time
+from pit_ingest import read_payloads, to_export
+from pit_store import KEY_COLUMNS, PitStore
+from sheet_sync import sync_dataframe, describe
+from shared_clients import open_spreadsheet
+import metrics
 
 # =========================
 # CONFIG
@@ -15,19 +18,13 @@ SHEET_ID = "1IUChF0UFKMqVLxTI69lXBi-g48f-oTYqI1K9miipKgY"
 TAB_NAME = "InsiderTrading"
 CSV_FILENAME = "InsiderTrading_Data.csv"
 
-# 1. Dynamically calculate dates for the last 12 months
-today = datetime.now()
-twelve_months_ago = today - timedelta(days=365)
+LOOKBACK_DAYS = 365
+WINDOW_DAYS = int(os.getenv("PIT_WINDOW_DAYS", "30"))  # Size of each corporates-pit sub-request
+MAX_CONCURRENT_WINDOWS = int(os.getenv("PIT_MAX_CONCURRENT", "4"))
+WINDOW_RETRIES = 3
 
-# Format dates to DD-MM-YYYY as required by NSE API
-from_date_str = twelve_months_ago.strftime("%d-%m-%Y")
-to_date_str = today.strftime("%d-%m-%Y")
-
-# Construct the dynamic API URL
-API_URL = f"https://www.nseindia.com/api/corporates-pit?index=equities&from_date={from_date_str}&to_date={to_date_str}"
-BASE_URL = "https://www.nseindia.com"
-
-print(f"Generated Dynamic URL: {API_URL}")
+BASE_URL = os.getenv("NSE_BASE_URL", "https://www.nseindia.com")
+API_URL = BASE_URL + "/api/corporates-pit?index=equities&from_date={}&to_date={}"
 
 # Standard headers to simulate a browser session
 HEADERS = {
@@ -40,70 +37,148 @@ HEADERS = {
 }
 
 
-def fetch_nse_data(api_url):
+def pit_url(from_date, to_date):
+    # Format dates to DD-MM-YYYY as required by NSE API
+    return API_URL.format(from_date.strftime("%d-%m-%Y"), to_date.strftime("%d-%m-%Y"))
+
+
+def date_windows(start, end, days=WINDOW_DAYS):
+    """Split [start, end] into consecutive inclusive windows of at most `days` days, newest first."""
+    windows = []
+    current = start
+    while current <= end:
+        window_end = min(current + timedelta(days=days - 1), end)
+        windows.append((current, window_end))
+        current = window_end + timedelta(days=1)
+    return windows[::-1]
+
+
+async def _fetch_window(session, semaphore, window):
+    from_date, to_date = window
+    label = f"{from_date:%d-%m-%Y} → {to_date:%d-%m-%Y}"
+    for attempt in range(WINDOW_RETRIES + 1):
+        async with semaphore:
+            metrics.count("http_requests")
+            try:
+                response = await session.get(pit_url(from_date, to_date), timeout=30)
+                content = response.content
+                metrics.count("http_bytes", len(content))
+                # Raw bytes are kept and parsed later; a block page is HTML, not JSON
+                if response.status_code == 200 and content.lstrip()[:1] == b"{":
+                    print(f"✅ {label}: {len(content) / 1024:.0f} KB")
+                    return content
+                reason = f"HTTP {response.status_code}"
+            except Exception as e:
+                reason = str(e)
+        if attempt < WINDOW_RETRIES:
+            metrics.count("http_retries")
+            delay = random.uniform(1, 2 ** (attempt + 1))
+            print(f"🔁 {label} failed ({reason}); retry {attempt + 1}/{WINDOW_RETRIES} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+    print(f"❌ {label} failed after {WINDOW_RETRIES + 1} attempts ({reason})")
+    return None
+
+
+async def fetch_pit_windows(windows):
+    """Fetch all windows concurrently on one cookie-primed session.
+
+    Returns (raw JSON payloads, failed_windows).
+    """
     # curl_cffi automatically mimics browser TLS fingerprints
-    session = requests.Session(impersonate="chrome") 
-    session.headers.update(HEADERS)
-
-    try:
+    async with requests.AsyncSession(impersonate="chrome", headers=HEADERS) as session:
         print("Visiting NSE home page for session cookies...")
-        session.get(BASE_URL, timeout=30)
-
-        # Add a tiny sleep to mimic human behavior
-        time.sleep(2)
-
-        print("Fetching PIT data for the last 12 months...")
-        response = session.get(api_url, timeout=30)
-
-        if response.status_code == 200:
-            return response.json()
+        try:
+            await session.get(BASE_URL, timeout=30)
+        except Exception as e:
+            # The window requests retry on their own; they may still get through without cookies
+            print(f"⚠️ Could not load the NSE home page ({e}); continuing without session cookies")
+
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_WINDOWS)
+        results = await asyncio.gather(*(_fetch_window(session, semaphore, w) for w in windows))
+
+    payloads, failed = [], []
+    for window, result in zip(windows, results):
+        if result is None:
+            failed.append(window)
         else:
-            print(f"Failed. HTTP Status Code: {response.status_code}")
-            return None
+            payloads.append(result)
+    return payloads, failed
 
+
+def latest_intimation_date(path=CSV_FILENAME):
+    """Newest intimDt already saved locally (ignoring bad future dates), or None."""
+    if not os.path.exists(path):
+        return None
+    try:
+        dates = pd.to_datetime(pd.read_csv(path, usecols=["intimDt"])["intimDt"], errors="coerce")
     except Exception as e:
-        print(f"An error occurred: {e}")
+        print(f"Could not read {path}: {e}")
         return None
-
-
-def process_and_upload_to_gsheet(json_data):
-    if not json_data or "data" not in json_data:
+    dates = dates[dates <= pd.Timestamp(datetime.now())]
+    return dates.max().to_pydatetime() if not dates.empty else None
+
+
+@metrics.timed()
+def fetch_nse_data(from_date, to_date):
+    print(f"Fetching PIT data from {from_date:%d-%m-%Y} to {to_date:%d-%m-%Y}...")
+    windows = date_windows(from_date, to_date)
+    with metrics.stage("fetch_pit_windows"):
+        payloads, failed = asyncio.run(fetch_pit_windows(windows))
+    if failed:
+        # A partial fetch would replace saved rows in the missing windows with nothing;
+        # keep the CSV, store and sheet as they are so the next run fetches the same range
+        print(f"❌ {len(failed)} of {len(windows)} window(s) could not be fetched; nothing saved this run")
+        return None
+    # Filters and column projection are applied while the payloads are streamed
+    with metrics.stage("read_payloads"):
+        return read_payloads(payloads)
+
+
+def merge_with_history(df, since, path=CSV_FILENAME):
+    """Replace saved rows broadcast on/after `since` with the fresh fetch and drop rows older than LOOKBACK_DAYS.
+
+    Rows are swapped by date range rather than de-duplicated, since the feed
+    legitimately repeats identical disclosures.
+    """
+    if os.path.exists(path):
+        history = pd.read_csv(path, dtype=str, keep_default_na=False)
+        if "date" in history.columns:
+            history = history[history["date"] < since.strftime("%Y-%m-%d")]
+        df = pd.concat([df.astype(str), history], ignore_index=True)
+    cutoff = (datetime.now() - timedelta(days=LOOKBACK_DAYS)).strftime("%Y-%m-%d")
+    if "date" in df.columns:
+        df = df[(df["date"] == "") | (df["date"] >= cutoff)]
+        df = df.sort_values("date", ascending=False, kind="stable")
+    return df.reset_index(drop=True)
+
+
+@metrics.timed()
+def process_and_upload_to_gsheet(df, since=None):
+    """Save and upload the filtered, typed PIT frame from `fetch_nse_data`."""
+    if df is None:
         print("No valid data found to save.")
         return
 
-    records = json_data["data"]
-    df = pd.DataFrame(records)
-
-    # ------------------ FILTERING ROWS ------------------
-    # 1. Keep only "Market Purchase" and "Market Sale"
-    if "acqMode" in df.columns:
-        df = df[df["acqMode"].isin(["Market Purchase", "Market Sale"])]
-
-    # 2. Keep only specified promoter/director categories
-    if "personCategory" in df.columns:
-        df = df[df["personCategory"].isin(["Promoters", "Promoter Group", "Director"])]
-
-    # 3. Keep only "Equity Shares"
-    if "secType" in df.columns:
-        df = df[df["secType"].isin(["Equity Shares"])]
-
-    # ------------------ REMOVING COLUMNS ------------------
-    columns_to_drop = [
-        "xbrlFileSize", "xbrl", "tkdAcqm", "tdpDerivativeContractType", 
-        "sellquantity", "sellValue", "remarks", "pid", "exchange", 
-        "did", "derivativeType", "buyValue", "buyQuantity", "anex"
-    ]
-    df = df.drop(columns=columns_to_drop, errors="ignore")
-
     # ------------------ DATE FORMATTING ------------------
-    # Convert specified columns to a clean YYYY-MM-DD date format string
-    date_columns = ["date", "intimDt", "acqfromDt", "acqtoDt"]
-    for col in date_columns:
-        if col in df.columns:
-            df[col] = pd.to_datetime(df[col], errors='coerce').dt.strftime('%Y-%m-%d')
+    # YYYY-MM-DD date strings and blanks for missing values, as the sheet expects
+    df = to_export(df)
+
+    # =========================
+    # LOCAL HISTORY STORE
+    # =========================
+    # Keeps every disclosure ever fetched (not just 12 months) for indexed queries
+    try:
+        with PitStore() as store:
+            if (store.count() == 0 or store.rebuilt) and os.path.exists(CSV_FILENAME):
+                added = store.import_csv(CSV_FILENAME)
+                print(f"Seeding PIT store from '{CSV_FILENAME}' ({added} rows added, {store.count()} stored)")
+            store.upsert(df)
+            print(f"PIT store now holds {store.count()} disclosures")
+    except Exception as e:
+        print(f"Failed to update PIT store: {e}")
 
-    # Replace NaN/Null values with empty strings for safe JSON serialization
-    df = df.fillna("")
+    if since is not None:
+        df = merge_with_history(df, since)
 
     # =========================
     # SAVE TO LOCAL CSV
@@ -118,39 +193,39 @@ def process_and_upload_to_gsheet(json_data):
     # GOOGLE SHEETS AUTH & UPLOAD
     # =========================
     print("Connecting to Google Sheets...")
-    credentials_json = os.getenv("GOOGLE_SHEETS_CREDENTIALS")
-    if not credentials_json:
-        raise ValueError("GOOGLE_SHEETS_CREDENTIALS environment variable not set!")
-
     try:
-        creds = Credentials.from_service_account_info(
-            json.loads(credentials_json),
-            scopes=["https://www.googleapis.com/auth/spreadsheets"]
-        )
-        client = gspread.authorize(creds)
-        
         # Open using the Spreadsheet ID and specific Tab Name
-        spreadsheet = client.open_by_key(SHEET_ID)
+        spreadsheet = open_spreadsheet(SHEET_ID)
         sheet = spreadsheet.worksheet(TAB_NAME)
         
-        # Clear previous data before refreshing
-        sheet.clear()
-        
-        # Convert DataFrame to list format (headers + row values)
-        data_to_upload = [df.columns.values.tolist()] + df.values.tolist()
-        
+        # Send only new or changed rows instead of clearing the tab
         print(f"Uploading {len(df)} filtered records to sheet tab '{TAB_NAME}'...")
-        sheet.update('A1', data_to_upload)
-        print("Successfully uploaded data to Google Sheets!")
+        report = sync_dataframe(sheet, df, key_columns=[c for c in KEY_COLUMNS if c in df.columns])
+        print(f"Successfully uploaded data to Google Sheets! ({describe(report)})")
 
     except Exception as e:
         print(f"Failed to complete Google Sheet operation: {e}")
 
 
-if __name__ == "__main__":
+def main(incremental=True):
+    today = datetime.now()
+    start = today - timedelta(days=LOOKBACK_DAYS)
+
+    # Only ask for disclosures after the newest one already saved (one day overlap)
+    latest = latest_intimation_date() if incremental else None
+    since = None
+    if latest is not None:
+        start = since = max(start, latest - timedelta(days=1))
+
     # Fetch the dynamic data
-    data = fetch_nse_data(API_URL)
+    data = fetch_nse_data(start, today)
+
+    # Save CSV and push to Google Sheets
+    if data is not None:
+        process_and_upload_to_gsheet(data, since=since)
 
-    # Process filters, save CSV, and push to Google Sheets
-    if data:
-        process_and_upload_to_gsheet(data)
+
+if __name__ == "__main__":
+    # --full re-fetches the whole 12-month window instead of only new disclosures
+    main(incremental="--full" not in sys.argv[1:])
+    metrics.write_report("insider_trading")
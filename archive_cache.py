@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import time
+
+import requests
+
+from metrics import count
+
+CACHE_DIR = os.getenv("ARCHIVE_CACHE_DIR", ".cache/archive")
+MAX_CACHE_BYTES = int(os.getenv("ARCHIVE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+MAX_CACHE_AGE_DAYS = int(os.getenv("ARCHIVE_CACHE_MAX_AGE_DAYS", "400"))
+
+
+class ArchiveCache:
+    """On-disk cache of raw archive responses keyed by URL.
+
+    Each entry is a body file plus a small JSON sidecar holding the URL,
+    ETag/Last-Modified validators and the time it was last fetched or
+    revalidated. Historical files are served straight from disk; recent
+    ones are revalidated with a conditional GET.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, max_age_days=MAX_CACHE_AGE_DAYS):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        os.makedirs(self.root, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.root, key)
+        return base + ".body", base + ".json"
+
+    def lookup(self, url):
+        """Return the cached metadata for `url`, or None if it is not cached."""
+        body_path, meta_path = self._paths(url)
+        if not (os.path.exists(body_path) and os.path.exists(meta_path)):
+            return None
+        try:
+            with open(meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def read(self, url):
+        body_path, _ = self._paths(url)
+        with open(body_path, "rb") as f:
+            return f.read()
+
+    def is_fresh(self, entry, immutable=False, max_age=0):
+        """Immutable entries never expire; others are fresh for `max_age` seconds."""
+        if immutable:
+            return True
+        return time.time() - entry["fetched_at"] < max_age
+
+    @staticmethod
+    def validators(entry):
+        """Conditional request headers for a cached entry."""
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url, body, headers):
+        body_path, meta_path = self._paths(url)
+        meta = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+            "size": len(body),
+        }
+        tmp = body_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(body)
+        os.replace(tmp, body_path)
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+
+    def touch(self, url):
+        """Mark a cached entry as just revalidated (after a 304)."""
+        entry = self.lookup(url)
+        if entry is None:
+            return
+        entry["fetched_at"] = time.time()
+        _, meta_path = self._paths(url)
+        with open(meta_path, "w") as f:
+            json.dump(entry, f)
+
+    def evict(self):
+        """Drop entries older than max_age, then the oldest ones until under max_bytes."""
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.root):
+            if not name.endswith(".json"):
+                continue
+            meta_path = os.path.join(self.root, name)
+            body_path = meta_path[:-5] + ".body"
+            try:
+                with open(meta_path) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                meta = {"fetched_at": 0, "size": 0}
+            entries.append((meta.get("fetched_at", 0), meta.get("size", 0), body_path, meta_path))
+
+        entries.sort()
+        total = sum(e[1] for e in entries)
+        removed = 0
+        for fetched_at, size, body_path, meta_path in entries:
+            if now - fetched_at <= self.max_age and total <= self.max_bytes:
+                break
+            for path in (body_path, meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            total -= size
+            removed += 1
+        if removed:
+            print(f"🧹 Evicted {removed} cached file(s) from {self.root}")
+        return removed
+
+    def summary(self):
+        return f"{self.hits} from disk, {self.revalidated} revalidated, {self.misses} downloaded"
+
+
+def fetch_cached(url, cache, headers=None, timeout=20, immutable=False, max_age=0):
+    """Blocking GET through the archive cache; returns the body bytes.
+
+    Raises requests exceptions like `requests.get(...).raise_for_status()`.
+    """
+    entry = cache.lookup(url)
+    if entry and cache.is_fresh(entry, immutable, max_age):
+        cache.hits += 1
+        count("cache_hits")
+        return cache.read(url)
+
+    request_headers = dict(headers or {})
+    request_headers.update(cache.validators(entry))
+    response = requests.get(url, headers=request_headers, timeout=timeout)
+    count("http_requests")
+    if response.status_code == 304 and entry:
+        cache.touch(url)
+        cache.revalidated += 1
+        count("cache_revalidated")
+        return cache.read(url)
+    response.raise_for_status()
+    cache.store(url, response.content, response.headers)
+    cache.misses += 1
+    count("http_bytes", len(response.content))
+    return response.content
@@ -0,0 +1,205 @@
+"""Benchmark nsdl_parser.parse_sector_table against the previous BeautifulSoup/read_html path.
+
+Runs both parsers over every saved FIIInvestSector_*.html page, checks they
+produce the same table and reports the per-page parse time.
+
+    python benchmarks/bench_nsdl_parser.py [--repeat N] [pages...]
+"""
+import argparse
+import glob
+import io
+import os
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from nsdl_parser import parse_sector_table  # noqa: E402
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "samples")
+
+
+# ================== BASELINE ==================
+def legacy_parse_report(content, report_date, url=""):
+    """The BeautifulSoup → read_html → iterrows path FPI_Sectors used before nsdl_parser."""
+    soup = BeautifulSoup(content, "html.parser")
+    table = soup.find("table")
+    if not table:
+        print(f"No table found on {url}")
+        return None
+
+    html_stream = io.StringIO(str(table))
+    df = pd.read_html(html_stream, header=None)[0]
+
+    data_start_idx = None
+    for idx, row in df.iterrows():
+        val = str(row.iloc[0]).strip()
+        if val in ["1", "1.0"]:
+            data_start_idx = idx
+            break
+
+    if data_start_idx is None:
+        print("Could not find data rows")
+        return None
+
+    header_rows = df.iloc[:data_start_idx]
+    data_rows = df.iloc[data_start_idx:].copy()
+
+    target_str = f"AUC as on {report_date.strftime('%B %d, %Y')}".lower()
+    
+    columns_to_keep = [0, 1]
+    final_cols = ["Sr_No", "Sector"]
+    equity_count = 0
+    total_count = 0
+
+    # For Net Investment (collecting all matches to slice by position later)
+    net_columns_to_keep = [0, 1]
+    net_final_cols = ["Sr_No", "Sector"]
+
+    for col_idx in range(2, len(df.columns)):
+        col_text = " ".join(header_rows[col_idx].dropna().astype(str).tolist()).lower()
+      
+        # AUC
+        if target_str in col_text and "inr" in col_text and "usd" not in col_text:
+            columns_to_keep.append(col_idx)
+            if "equity" in col_text:
+                equity_count += 1
+                final_cols.append("AUC_Equity_Cr" if equity_count == 1 else f"AUC_Equity_Cr_{equity_count}")
+            elif "total" in col_text:
+                total_count += 1
+                final_cols.append("AUC_Total_Cr" if total_count == 1 else f"AUC_Total_Cr_{total_count}")
+            else:
+                final_cols.append(f"AUC_Col_{col_idx}")
+
+        # Net Investment (Collects all matching columns dynamically)
+        if ("net investment" in col_text or "net inv" in col_text) and "inr" in col_text and "usd" not in col_text:
+            net_columns_to_keep.append(col_idx)
+            if "equity" in col_text:
+                net_final_cols.append("Net_Equity_Cr")
+            elif "total" in col_text:
+                net_final_cols.append("Net_Total_Cr")
+            else:
+                net_final_cols.append(f"Net_Col_{col_idx}")
+
+    # AUC DataFrame
+    auc_df = data_rows[columns_to_keep].copy()
+    auc_df.columns = final_cols[:len(auc_df.columns)]
+
+    # Net Investment DataFrame (Handles positional filtering to keep correct data)
+    net_df = data_rows[net_columns_to_keep].copy()
+    net_df.columns = net_final_cols[:len(net_df.columns)]
+
+    # Clean row elements
+    for d in [auc_df, net_df]:
+        d = d[d["Sector"].notna()]
+        d = d[~d["Sector"].str.contains("Sectors|Total|Grand Total", case=False, na=False)]
+        d.reset_index(drop=True, inplace=True)
+
+    # --- POSITION FILTER FOR DUPLICATE NET COLUMNS ---
+    # Tracks positions of all matching strings to precisely slice out the older fortnight data
+    equity_indices = [i for i, col in enumerate(net_df.columns) if col == 'Net_Equity_Cr']
+    total_indices = [i for i, col in enumerate(net_df.columns) if col == 'Net_Total_Cr']
+
+    net_cols_mask = []
+    for i, col in enumerate(net_df.columns):
+        if col == 'Net_Equity_Cr':
+            # Keep the 3rd Equity column found (corresponds to latest fortnight)
+            if len(equity_indices) >= 3 and i == equity_indices[2]:
+                net_cols_mask.append(True)
+            elif len(equity_indices) < 3 and i == equity_indices[0]:
+                net_cols_mask.append(True)
+            else:
+                net_cols_mask.append(False)
+        elif col == 'Net_Total_Cr':
+            # Keep the 2nd Total column found (corresponds to latest fortnight)
+            if len(total_indices) >= 2 and i == total_indices[1]:
+                net_cols_mask.append(True)
+            elif len(total_indices) < 2 and i == total_indices[0]:
+                net_cols_mask.append(True)
+            else:
+                net_cols_mask.append(False)
+        else:
+            net_cols_mask.append(True)
+
+    # Apply positional mask to drop the undesired redundant columns
+    net_df = net_df.loc[:, net_cols_mask]
+
+    auc_df["Report_Date"] = report_date.strftime("%Y-%m-%d")
+    net_df["Report_Date"] = report_date.strftime("%Y-%m-%d")
+
+    # Merge AUC + Net
+    final_df = pd.merge(auc_df, net_df.drop(columns=['Sr_No'], errors='ignore'),
+                        on=['Report_Date', 'Sector'], how='left')
+    return final_df
+
+
+# ================== HELPERS ==================
+def report_date_from_name(path):
+    stem = os.path.basename(path)[len("FIIInvestSector_"):-len(".html")]
+    for fmt in ("%b%d%Y", "%B%d%Y"):
+        try:
+            return datetime.strptime(stem, fmt)
+        except ValueError:
+            pass
+    raise ValueError(f"Cannot read a report date from {path}")
+
+
+def same_table(old, new):
+    """Compare values after giving the baseline the same numeric typing."""
+    if old is None or new is None:
+        return old is None and new is None
+    if list(old.columns) != list(new.columns) or old.shape != new.shape:
+        return False
+    old = old.reset_index(drop=True).copy()
+    numeric = [c for c in old.columns if c not in ("Sector", "Report_Date")]
+    old[numeric] = old[numeric].apply(lambda s: pd.to_numeric(s.astype(str).str.replace(",", "", regex=False),
+                                                              errors="coerce"))
+    return old.astype("float64", errors="ignore").fillna(0).astype(str).equals(
+        new.astype("float64", errors="ignore").fillna(0).astype(str))
+
+
+def time_parser(fn, content, report_date, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(content, report_date)
+    return (time.perf_counter() - start) / repeat, result
+
+
+# ================== MAIN ==================
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pages", nargs="*", help="HTML pages (default: benchmarks/samples/*.html)")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    pages = args.pages or sorted(glob.glob(os.path.join(SAMPLES_DIR, "FIIInvestSector_*.html")))
+    if not pages:
+        print("No sample pages found.")
+        return 1
+
+    total_old = total_new = 0.0
+    ok = True
+    print(f"{'page':<36}{'legacy ms':>12}{'lxml ms':>12}{'speedup':>10}  match")
+    for path in pages:
+        with open(path, "rb") as f:
+            content = f.read()
+        report_date = report_date_from_name(path)
+        old_t, old_df = time_parser(legacy_parse_report, content, report_date, args.repeat)
+        new_t, new_df = time_parser(parse_sector_table, content, report_date, args.repeat)
+        match = same_table(old_df, new_df)
+        ok &= match
+        total_old += old_t
+        total_new += new_t
+        print(f"{os.path.basename(path):<36}{old_t * 1000:>12.2f}{new_t * 1000:>12.2f}"
+              f"{old_t / new_t:>9.1f}x  {'✅' if match else '❌'}")
+
+    print(f"\nTotal per run: legacy {total_old * 1000:.1f} ms, lxml {total_new * 1000:.1f} ms "
+          f"({total_old / total_new:.1f}x faster)")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
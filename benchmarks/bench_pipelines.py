@@ -0,0 +1,283 @@
+"""Offline end-to-end benchmark of every pipeline against local NSE/NSDL/Sheets/Telegram stand-ins.
+
+Each pipeline's real entry point runs in a scratch directory against
+benchmarks/fake_services.py: fiidiiparticipants.main, FPI_Sectors.main,
+InsiderTrading.main, FIIDII_Telegram.main and CIAList_to_Tele.main. Sizes
+scale the work (trading days, fortnights, PIT records, chats, sheet rows).
+Fetch pipelines backed by the archive cache are timed cold and again warm.
+Throughput, run latency and request/retry counts (from metrics) are printed
+per pipeline and size.
+
+    python benchmarks/bench_pipelines.py [--pipelines participants,cialist] [--repeat N]
+        [--latency MS] [--error-rate P] [--sizes participants=1,3] [--json out.json]
+
+Client-side rate limits are lifted so the numbers measure the code, not the
+politeness delays; pass --real-rate-limits to keep them.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+import gspread
+import pytz
+
+from fake_services import FakeServices, FakeSpreadsheet, ROOT, fortnight_dates, sheet_report_values
+
+RATE_LIMIT_ENV = ["NSE_RATE_PER_HOST", "NSDL_RATE", "NSDL_BURST", "TELEGRAM_GLOBAL_RATE", "TELEGRAM_PER_CHAT_RATE"]
+BENCH_TOKEN = "bench"
+BENCH_CREDENTIALS = object()
+
+# Pipeline name → (size unit, default sizes, uses the archive cache)
+PIPELINES = {
+    "participants": ("months", [1, 3, 6], True),
+    "fpi_sectors": ("fortnights", [6, 12, 26], True),
+    "insider_trading": ("records", [1000, 5000, 20000], False),
+    "fii_telegram": ("chats", [1, 5, 20], False),
+    "cialist": ("rows", [50, 500, 2000], False),
+}
+
+
+# ================== ENVIRONMENT ==================
+def configure_env(services, real_rate_limits=False):
+    """Point every module at the stand-ins; must run before the pipeline modules are imported."""
+    os.environ["NSE_ARCHIVES_URL"] = services.url
+    os.environ["NSE_BASE_URL"] = services.url
+    os.environ["TELEGRAM_API_URL"] = services.url
+    os.environ["GOOGLE_SHEETS_CREDENTIALS"] = "{}"  # Only checked for presence; clients are replaced
+    if not real_rate_limits:
+        for name in RATE_LIMIT_ENV:
+            os.environ[name] = "1000"
+
+
+def reset_workdir(keep_archive=False):
+    """Empty the scratch directory, optionally keeping the archive cache for a warm run."""
+    for name in os.listdir("."):
+        if name == ".cache" and keep_archive:
+            for inner in os.listdir(name):
+                if inner != "archive":
+                    shutil.rmtree(os.path.join(name, inner), ignore_errors=True)
+        elif os.path.isdir(name):
+            shutil.rmtree(name)
+        else:
+            os.remove(name)
+    os.makedirs(os.path.join(".cache", "archive"), exist_ok=True)
+
+
+def install_sheets(args, cia_rows=0):
+    """Fresh fake spreadsheets for the report sheet and the CIA list, served through shared_clients."""
+    import shared_clients
+    import CIAList_to_Tele
+    from sheet_sync import MemoryClient
+    import fiidiiparticipants
+
+    latency = args.latency / 1000
+    report = FakeSpreadsheet(fiidiiparticipants.SHEET_ID, latency, args.error_rate)
+    for tab in ("FPI_Sectors", "InsiderTrading"):
+        report.add_worksheet(tab)
+    fii = report.add_worksheet("Fiiparticipants")
+    fii.update(sheet_report_values(), "D30")
+    fii.update([[date.today().strftime("%d-%b-%Y")]], "B32")
+
+    cia = FakeSpreadsheet(CIAList_to_Tele.GSHEET_ID, latency, args.error_rate)
+    ws = cia.add_worksheet(CIAList_to_Tele.TAB_NAME, rows=cia_rows + 1, cols=72)
+    today = datetime.now(pytz.timezone("Asia/Kolkata")).strftime("%Y-%m-%d")  # The day CIAList filters on
+    columns = {
+        "A": ["Timestamp"] + [f"{today} {9 + i // 3600 % 7:02d}:{i // 60 % 60:02d}:{i % 60:02d}" for i in range(cia_rows)],
+        "E": ["Close"] + [f"{100 + i * 0.05:.2f}" for i in range(cia_rows)],
+        "G": ["Symbol"] + [f"SYM{i:04d}" for i in range(cia_rows)],
+        "H": ["ST"] + ["Buy" if i % 2 else "Sell" for i in range(cia_rows)],
+        "K": ["Power"] + [str(i % 10) for i in range(cia_rows)],
+        "BT": ["BT"] + ["TRUE"] * cia_rows,
+    }
+    for letter, values in columns.items():
+        ws.update([[v] for v in values], f"{letter}1")
+
+    # Go through the real open_spreadsheet → get_gspread_client path so nested client
+    # construction is exercised; only the credentials and the authorize call are stubbed
+    client = MemoryClient()
+    client.spreadsheets = {report.id: report, cia.id: cia}
+    shared_clients.reset()
+    shared_clients.get_credentials = lambda: BENCH_CREDENTIALS
+    gspread.authorize = lambda credentials: client if credentials is BENCH_CREDENTIALS else None
+    return report, cia
+
+
+# ================== PIPELINES ==================
+def run_participants(months, args):
+    import fiidiiparticipants
+    from dateutil.relativedelta import relativedelta
+    from trading_calendar import trading_days
+
+    install_sheets(args)
+    fiidiiparticipants.RETENTION_MONTHS = months
+    asyncio.run(fiidiiparticipants.main(incremental=True, export_csv=True))
+    return len(list(trading_days(date.today() - relativedelta(months=months), date.today())))
+
+
+def run_fpi_sectors(fortnights, args, services):
+    import FPI_Sectors
+    from nsdl_resolver import URLS_FILE
+
+    install_sheets(args)
+    dates = fortnight_dates(fortnights)
+    # Seed the resolver so it maps every fortnight to the stand-in without probing NSDL
+    os.makedirs(os.path.dirname(URLS_FILE) or ".", exist_ok=True)
+    with open(URLS_FILE, "w") as f:
+        json.dump({d.strftime("%Y-%m-%d"): {"date": d.strftime("%Y-%m-%d"),
+                                             "url": f"{services.url}/nsdl/FIIInvestSector_{d:%b%d%Y}.html"}
+                   for d in dates}, f)
+    FPI_Sectors.generate_dates_last_12_months = lambda: dates
+    FPI_Sectors.main(full=True)
+    return fortnights
+
+
+def run_insider_trading(records, args, services):
+    import InsiderTrading
+
+    install_sheets(args)
+    services.set_pit_records(records)
+    InsiderTrading.main(incremental=False)
+    return records
+
+
+def run_fii_telegram(chats, args):
+    import FIIDII_Telegram
+
+    install_sheets(args)
+    FIIDII_Telegram.TELEGRAM_BOT_TOKEN = BENCH_TOKEN
+    FIIDII_Telegram.TELEGRAM_CHAT_ID = ",".join(f"-100{i:06d}" for i in range(chats))
+    FIIDII_Telegram.main(local=False, drain_now=True)
+    return chats
+
+
+def run_cialist(rows, args):
+    import CIAList_to_Tele
+
+    install_sheets(args, cia_rows=rows)
+    CIAList_to_Tele.TELEGRAM_BOT_TOKEN = BENCH_TOKEN
+    CIAList_to_Tele.TELEGRAM_CHAT_IDS = "-100000001,-100000002,-100000003"
+    CIAList_to_Tele.main(new_only=False, drain_now=True)
+    return rows
+
+
+def run_once(name, size, args, services):
+    runners = {
+        "participants": lambda: run_participants(size, args),
+        "fpi_sectors": lambda: run_fpi_sectors(size, args, services),
+        "insider_trading": lambda: run_insider_trading(size, args, services),
+        "fii_telegram": lambda: run_fii_telegram(size, args),
+        "cialist": lambda: run_cialist(size, args),
+    }
+    return runners[name]()
+
+
+# ================== MAIN ==================
+def parse_sizes(values):
+    sizes = {}
+    for value in values or []:
+        name, _, numbers = value.partition("=")
+        if name not in PIPELINES or not numbers:
+            raise ValueError(f"--sizes expects NAME=N[,N...] with NAME in {', '.join(PIPELINES)}")
+        sizes[name] = [int(n) for n in numbers.split(",")]
+    return sizes
+
+
+def measure(name, size, warm, args, services):
+    import metrics
+
+    seconds, items, counters = [], 0, {}
+    for _ in range(args.repeat):
+        reset_workdir(keep_archive=warm)
+        if warm:
+            with contextlib.redirect_stdout(io.StringIO()):
+                run_once(name, size, args, services)  # Fill the cache
+            reset_workdir(keep_archive=True)
+        metrics.reset()
+        services.reset_stats()
+        output = sys.stdout if args.verbose else io.StringIO()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(output):
+            items = run_once(name, size, args, services)
+        seconds.append(time.perf_counter() - start)
+        for key, value in metrics.snapshot()["counters"].items():
+            counters[key] = counters.get(key, 0) + value
+    runs = len(seconds)
+    median = statistics.median(seconds)
+    return {
+        "pipeline": name, "size": size, "unit": PIPELINES[name][0], "cache": "warm" if warm else "cold",
+        "runs": runs, "median_s": round(median, 4), "min_s": round(min(seconds), 4),
+        "max_s": round(max(seconds), 4), "items_per_s": round(items / median, 2) if median else None,
+        "requests": round(sum(v for k, v in counters.items() if k.endswith("_requests")) / runs, 1),
+        "retries": round(sum(v for k, v in counters.items() if k.endswith("_retries")) / runs, 1),
+        "counters": {k: round(v / runs, 1) for k, v in sorted(counters.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pipelines", help=f"comma-separated subset of {', '.join(PIPELINES)}")
+    parser.add_argument("--sizes", action="append", help="override sizes, e.g. participants=1,3")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=5.0, help="stand-in latency per request, ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability a request fails")
+    parser.add_argument("--no-warm", action="store_true", help="skip the warm-cache runs")
+    parser.add_argument("--real-rate-limits", action="store_true")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the pipelines' own output")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.pipelines.split(",")] if args.pipelines else list(PIPELINES)
+    unknown = [n for n in names if n not in PIPELINES]
+    if unknown:
+        parser.error(f"Unknown pipeline(s): {', '.join(unknown)}")
+    try:
+        sizes = parse_sizes(args.sizes)
+    except ValueError as e:
+        parser.error(str(e))
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    workdir = tempfile.mkdtemp(prefix="bench_pipelines_")
+    services = FakeServices(latency=args.latency / 1000, error_rate=args.error_rate).start()
+    configure_env(services, args.real_rate_limits)
+    sys.path.insert(0, ROOT)
+    os.chdir(workdir)
+
+    print(f"Stand-ins at {services.url}, latency {args.latency:g} ms, error rate {args.error_rate:g}, "
+          f"{args.repeat} run(s) each\n")
+    print(f"{'pipeline':<16}{'size':>12} {'cache':<6}{'median s':>10}{'min s':>9}{'max s':>9}"
+          f"{'items/s':>10}{'requests':>10}{'retries':>9}")
+    results = []
+    try:
+        for name in names:
+            unit, default_sizes, cached = PIPELINES[name]
+            for size in sizes.get(name, default_sizes):
+                for warm in ([False, True] if cached and not args.no_warm else [False]):
+                    r = measure(name, size, warm, args, services)
+                    results.append(r)
+                    print(f"{name:<16}{f'{size} {unit}':>12} {r['cache']:<6}{r['median_s']:>10.3f}"
+                          f"{r['min_s']:>9.3f}{r['max_s']:>9.3f}{r['items_per_s'] or 0:>10.1f}"
+                          f"{r['requests']:>10.1f}{r['retries']:>9.1f}")
+    finally:
+        services.stop()
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump({"run": datetime.now().isoformat(timespec="seconds"), "latency_ms": args.latency,
+                       "error_rate": args.error_rate, "results": results}, f, indent=2)
+        print(f"\nResults written to {json_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
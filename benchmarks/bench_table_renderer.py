@@ -0,0 +1,169 @@
+"""Benchmark table_renderer.render_table_png against the previous per-cell matplotlib renderer.
+
+Renders the FII participants table from sheet_data.json (or the given
+values file) with both renderers, checks the PNGs have the same size and
+content (gridline anti-aliasing may move by a pixel) and reports the render
+time.
+
+    python benchmarks/bench_table_renderer.py [--repeat N] [values.json]
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import pytz  # noqa: E402
+from PIL import Image  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from table_renderer import footer_text, render_table_png  # noqa: E402
+
+
+# ================== BASELINE ==================
+def legacy_render(df, path, footer_text):
+    """The per-cell ax.table loop FIIDII_Telegram used before table_renderer (footer passed in)."""
+    # Plot DataFrame as a table
+    fig, ax = plt.subplots(figsize=(min(12, len(df.columns) * 1.5), len(df) * 0.5 + 0.5))  # Reduced height to minimize top space
+    ax.axis("off")
+
+    # Adjust table bounding box to remove space above and maximize table size
+    table = ax.table(
+        cellText=df.values,
+        colLabels=df.columns,
+        loc="center",
+        cellLoc="center",
+        colColours=['#FFA07A'] * len(df.columns),  # Light orange headers
+        bbox=[0, 0.05, 1, 0.90]  # Adjusted: 5% bottom margin, 90% height to maximize table size
+    )
+    table.auto_set_font_size(False)
+    table.set_fontsize(10)
+    table.scale(1, 1.5)
+
+    # Style the table to match Google Sheets color scheme
+    for (i, j), cell in table.get_celld().items():
+        cell.set_edgecolor('#D3D3D3')  # Light gray gridlines
+        cell.set_linewidth(0.5)  # Thin gridlines
+        if i == 0:  # Header row
+            cell.set_text_props(weight='bold', color='black')
+            cell.set_facecolor('#FFA07A')  # Light orange for headers
+        elif j == 0 and i > 0:  # First column (e.g., "Stock Future")
+            cell.set_facecolor('#D3D3D3')  # Gray for column D
+            cell.set_text_props(weight='bold', color='black')
+        else:
+            # Apply color based on Interpretation column (column H, index 5)
+            interpretation = df.iloc[i-1, 5] if i > 0 and len(df.columns) > 5 and j == 5 else None
+            if j == 5:  # Column H (Interpretation)
+                if interpretation == "Bearish":
+                    cell.set_facecolor('#FF9999')  # Light red for Bearish
+                    cell.set_text_props(color='black')
+                elif interpretation == "Bullish":
+                    cell.set_facecolor('#99FF99')  # Light green for Bullish
+                    cell.set_text_props(color='black')
+                else:
+                    cell.set_facecolor('#FFFFFF')  # White for other values in Interpretation
+                    cell.set_text_props(color='black')
+            elif j == 1:  # Column E (specific coloring)
+                if i-1 in [0, 6, 12, 18]:  # E31, E37, E43, E49 (0-based indices 1, 7, 13, 19)
+                    cell.set_facecolor('#ADD8E6')  # Light blue
+                elif (2 <= i <= 6) or (8 <= i <= 11) or (14 <= i <= 17) or (20 <= i <= 23):  # E32:E36, E38:E41, E44:E47, E50:E53
+                    cell.set_facecolor('#FFFF99')  # Light yellow
+                else:
+                    cell.set_facecolor('#FFFFFF')  # Default white
+            elif j in [2, 3, 4, 5] and i-1 in [0, 6, 12, 18]:  # F31:I31, F37:I37, F43:I43, F49:I49 (0-based indices 1, 7, 13, 19)
+                cell.set_facecolor('#D2B48C')  # Light brown
+            else:
+                cell.set_facecolor('#FFFFFF')  # White for other cells
+
+            # Apply value-based font color for numeric columns (e.g., Net Position, Today Net Change)
+            try:
+                value = float(df.iloc[i-1, j]) if i > 0 and pd.notna(df.iloc[i-1, j]) else None
+                if value is not None and j in [1, 2, 3, 6]:  # Apply to columns E, F, G, J
+                    reverse_color_rows = {4, 10, 16, 22}
+                    if i-1 in reverse_color_rows:
+                        cell.set_text_props(color='red' if value >= 0 else 'green')
+                    else:
+                        cell.set_text_props(color='green' if value >= 0 else 'red')
+                else:
+                    cell.set_text_props(color='black')
+            except (ValueError, TypeError):
+                cell.set_text_props(color='black')
+
+    # Add footer below the table
+    fig.text(0.5, 0.02, footer_text, ha='center', va='bottom', fontsize=8,
+             color='black', bbox=dict(facecolor='#F0F0F0', edgecolor='none', pad=3))
+
+    # Adjust layout to prevent clipping
+    plt.tight_layout()
+    plt.savefig(path, dpi=300, bbox_inches='tight', facecolor='white')  # High DPI for quality
+    plt.close()
+
+
+# ================== HELPERS ==================
+def build_dataframe(values):
+    width = 7
+    headers = (values[0] + [""] * width)[:width]
+    rows = [(row + [""] * width)[:width] for row in values[1:]]
+    return pd.DataFrame(rows, columns=headers)
+
+
+MAX_CHANGED = 0.005  # Share of pixels allowed to differ visibly
+
+
+def pixels(png):
+    return np.asarray(Image.open(io.BytesIO(png)).convert("RGB")).astype(int)
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+# ================== MAIN ==================
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("values", nargs="?", default=os.path.join(ROOT, "sheet_data.json"))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with open(args.values) as f:
+        df = build_dataframe(json.load(f))
+    footer = footer_text(datetime(2026, 8, 19, 18, 0, tzinfo=pytz.timezone("Asia/Kolkata")))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "legacy.png")
+
+        def legacy():
+            legacy_render(df, path, footer)
+            with open(path, "rb") as f:
+                return f.read()
+
+        old_t, old_png = best_of(legacy, args.repeat)
+    new_t, new_png = best_of(lambda: render_table_png(df, footer), args.repeat)
+
+    old_px, new_px = pixels(old_png), pixels(new_png)
+    same_size = old_px.shape == new_px.shape
+    changed = (np.abs(old_px - new_px).sum(axis=2) > 60).mean() if same_size else 1.0
+    print(f"table {df.shape[0]}x{df.shape[1]}, image {new_px.shape[1]}x{new_px.shape[0]} px")
+    print(f"legacy   {old_t * 1000:8.1f} ms  {len(old_png) / 1024:7.0f} KB")
+    print(f"renderer {new_t * 1000:8.1f} ms  {len(new_png) / 1024:7.0f} KB")
+    ok = same_size and changed <= MAX_CHANGED
+    print(f"{old_t / new_t:.1f}x faster, {changed:.2%} of pixels changed {'✅' if ok else '❌'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
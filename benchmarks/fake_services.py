@@ -0,0 +1,300 @@
+"""Local stand-ins for NSE, NSDL, Google Sheets and Telegram used by the offline benchmarks.
+
+FakeServices is one aiohttp server on 127.0.0.1 that replays fixtures built
+from files committed in this repo:
+
+    GET  /content/nsccl/fao_participant_oi_DDMMYYYY.csv   participant OI, from fao_participant_oi_data.csv
+    GET  /nsdl/FIIInvestSector_<Mon><DD><YYYY>.html        a benchmarks/samples page re-dated to the request
+    GET  /                                                 NSE home page (sets a cookie)
+    GET  /api/corporates-pit?from_date=..&to_date=..       PIT JSON shaped like InsiderTrading_Data.csv
+    POST /bot<token>/<method>                              Telegram Bot API (sendMessage, sendPhoto)
+
+Every route waits `latency` seconds and fails with probability
+`error_rate` (503 for NSE/NSDL, 429 with retry_after for Telegram).
+FakeSpreadsheet adds the same latency and error injection to the
+in-memory Sheets stand-in from sheet_sync.
+"""
+import asyncio
+import calendar
+import csv
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import requests
+from aiohttp import web
+from gspread.exceptions import APIError
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from sheet_sync import MemorySpreadsheet  # noqa: E402
+
+SAMPLES_DIR = os.path.join(ROOT, "benchmarks", "samples")
+PARTICIPANT_CSV = os.path.join(ROOT, "fao_participant_oi_data.csv")
+PIT_CSV = os.path.join(ROOT, "InsiderTrading_Data.csv")
+SHEET_DATA = os.path.join(ROOT, "sheet_data.json")
+
+# The sample NSDL page and the two dates printed in its headers
+NSDL_SAMPLE = "FIIInvestSector_Oct152026.html"
+NSDL_SAMPLE_DATES = ("October 15, 2026", "October 01, 2026")
+
+
+# ================== FIXTURES ==================
+def participant_days(path=PARTICIPANT_CSV):
+    """One rendered NSE participant OI CSV (bytes) per trading day in the committed history."""
+    with open(path, newline="") as f:
+        rows = list(csv.reader(f))
+    header, rows = rows[0], rows[1:]
+    date_idx = header.index("Date")
+    by_day = {}
+    for row in rows:
+        by_day.setdefault(row[date_idx], []).append(row[:date_idx] + row[date_idx + 1:])
+    columns = header[:date_idx] + header[date_idx + 1:]
+
+    days = []
+    for day, day_rows in by_day.items():
+        out = io.StringIO()
+        out.write(f'"Participant wise Open Interest (no. of contracts) in Equity Derivatives as on {day}"\n')
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow(columns)
+        writer.writerows(day_rows)
+        totals = [sum(int(float(r[i] or 0)) for r in day_rows) for i in range(1, len(columns))]
+        writer.writerow(["TOTAL"] + totals)
+        days.append(out.getvalue().encode())
+    return days
+
+
+def nsdl_page(report_date, template):
+    """The sample page with its fortnight dates replaced by `report_date`'s."""
+    start = report_date.replace(day=1 if report_date.day <= 15 else 16)
+    current, previous = NSDL_SAMPLE_DATES
+    return (template.replace(current, report_date.strftime("%B %d, %Y"))
+                    .replace(previous, start.strftime("%B %d, %Y"))).encode()
+
+
+def pit_records(n, today=None, path=PIT_CSV):
+    """`n` raw corporates-pit records spread over the last year, newest first.
+
+    Field values cycle through InsiderTrading_Data.csv; dates and numbers are
+    written the way the NSE API returns them (some values with paise), with
+    the extra fields the pipeline drops, and every fifth record fails the filters.
+    """
+    with open(path, newline="") as f:
+        source = list(csv.DictReader(f))
+    today = today or date.today()
+    records = []
+    for i in range(n):
+        row = dict(source[i % len(source)])
+        day = today - timedelta(days=int(i * 365 / max(n, 1)))
+        for field in ("acqfromDt", "acqtoDt"):
+            row[field] = (day - timedelta(days=3)).strftime("%d-%b-%Y")
+        row["intimDt"] = (day - timedelta(days=1)).strftime("%d-%b-%Y")
+        row["date"] = day.strftime("%d-%b-%Y") + " 19:12"
+        if i % 5 == 4:
+            row["acqMode"] = "Off Market"
+        if i % 7 == 3:
+            row["secVal"] = f"{row['secVal']}.45"  # Values can carry paise
+        row.update({"pid": str(100000 + i), "anex": "", "remarks": "-", "exchange": "NSE",
+                    "xbrl": f"https://nsearchives.nseindia.com/corporate/xbrl/PIT_{100000 + i}.xml",
+                    "derivativeType": None, "tkdAcqm": None})
+        records.append((day, row))
+    return records
+
+
+def sheet_report_values(path=SHEET_DATA):
+    with open(path) as f:
+        return json.load(f)
+
+
+# ================== SHEETS ==================
+def _api_error(code=429, message="Quota exceeded"):
+    response = requests.models.Response()
+    response.status_code = code
+    response._content = json.dumps({"error": {"code": code, "message": message,
+                                              "status": "RESOURCE_EXHAUSTED"}}).encode()
+    return APIError(response)
+
+
+class FakeSpreadsheet(MemorySpreadsheet):
+    """MemorySpreadsheet whose values.batchGet/batchUpdate calls are slow and sometimes throttled."""
+
+    def __init__(self, sheet_id="local", latency=0.0, error_rate=0.0, rng=None):
+        super().__init__(sheet_id)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rng = rng or random.Random(0)
+        self.errors = 0
+
+    def _call(self):
+        time.sleep(self.latency)
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.errors += 1
+            raise _api_error()
+
+    def values_batch_update(self, body):
+        self._call()
+        return super().values_batch_update(body)
+
+    def values_batch_get(self, ranges, params=None):
+        self._call()
+        return super().values_batch_get(ranges, params)
+
+
+# ================== HTTP SERVER ==================
+class FakeServices:
+    """NSE/NSDL/Telegram stand-in served from a background thread.
+
+    Use as a context manager; `url` is the base URL once started. `requests`
+    counts hits per route and `handler_seconds` keeps each request's time
+    inside the server (including the injected latency).
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, retry_after=1, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.participant_days = participant_days()
+        with open(os.path.join(SAMPLES_DIR, NSDL_SAMPLE), encoding="utf-8") as f:
+            self.nsdl_template = f.read()
+        self.pit = []
+        self.requests = {}
+        self.handler_seconds = []
+        self.url = None
+        self._loop = None
+        self._runner = None
+        self._thread = None
+
+    def set_pit_records(self, n):
+        self.pit = pit_records(n)
+
+    def reset_stats(self):
+        self.requests = {}
+        self.handler_seconds = []
+
+    # ---------- handlers ----------
+    def _failed(self):
+        return self.error_rate and self.rng.random() < self.error_rate
+
+    async def _enter(self, route):
+        start = time.perf_counter()
+        self.requests[route] = self.requests.get(route, 0) + 1
+        await asyncio.sleep(self.latency)
+        return start
+
+    def _done(self, start, response):
+        self.handler_seconds.append(time.perf_counter() - start)
+        return response
+
+    async def participant_oi(self, request):
+        start = await self._enter("participant_oi")
+        if self._failed():
+            return self._done(start, web.Response(status=503))
+        stamp = request.match_info["stamp"]
+        try:
+            day = datetime.strptime(stamp, "%d%m%Y").date()
+        except ValueError:
+            return self._done(start, web.Response(status=404))
+        body = self.participant_days[day.toordinal() % len(self.participant_days)]
+        return self._done(start, web.Response(body=body, content_type="text/csv"))
+
+    async def nsdl(self, request):
+        start = await self._enter("nsdl")
+        if self._failed():
+            return self._done(start, web.Response(status=503))
+        stem = request.match_info["stem"]
+        for fmt in ("%b%d%Y", "%B%d%Y"):
+            try:
+                report_date = datetime.strptime(stem, fmt)
+                break
+            except ValueError:
+                pass
+        else:
+            return self._done(start, web.Response(status=404))
+        return self._done(start, web.Response(body=nsdl_page(report_date, self.nsdl_template),
+                                              content_type="text/html"))
+
+    async def home(self, request):
+        start = await self._enter("home")
+        response = web.Response(text="<html><body>NSE</body></html>", content_type="text/html")
+        response.set_cookie("nsit", "local")
+        return self._done(start, response)
+
+    async def corporates_pit(self, request):
+        start = await self._enter("corporates_pit")
+        if self._failed():
+            return self._done(start, web.Response(status=503))
+        first = datetime.strptime(request.query["from_date"], "%d-%m-%Y").date()
+        last = datetime.strptime(request.query["to_date"], "%d-%m-%Y").date()
+        data = [row for day, row in self.pit if first <= day <= last]
+        return self._done(start, web.Response(body=json.dumps({"acqNameList": [], "data": data}).encode(),
+                                              content_type="application/json"))
+
+    async def telegram(self, request):
+        start = await self._enter(f"telegram:{request.match_info['method']}")
+        await request.read()
+        if self._failed():
+            body = {"ok": False, "error_code": 429, "description": "Too Many Requests",
+                    "parameters": {"retry_after": self.retry_after}}
+            return self._done(start, web.json_response(body, status=429))
+        return self._done(start, web.json_response({"ok": True, "result": {"message_id": 1}}))
+
+    # ---------- lifecycle ----------
+    def _app(self):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_get("/content/nsccl/fao_participant_oi_{stamp}.csv", self.participant_oi)
+        app.router.add_get("/nsdl/FIIInvestSector_{stem}.html", self.nsdl)
+        app.router.add_get("/", self.home)
+        app.router.add_get("/api/corporates-pit", self.corporates_pit)
+        app.router.add_post("/bot{token}/{method}", self.telegram)
+        return app
+
+    def start(self):
+        started = threading.Event()
+
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._runner = web.AppRunner(self._app(), access_log=None)
+            self._loop.run_until_complete(self._runner.setup())
+            site = web.TCPSite(self._runner, "127.0.0.1", 0)
+            self._loop.run_until_complete(site.start())
+            port = site._server.sockets[0].getsockname()[1]
+            self.url = f"http://127.0.0.1:{port}"
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=serve, name="fake-services", daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def fortnight_dates(n, today=None):
+    """The last `n` nominal NSDL fortnights (15th and month-end) before `today`, newest first."""
+    today = today or date.today()
+    dates, year, month = [], today.year, today.month
+    while len(dates) < n + 2:
+        last = calendar.monthrange(year, month)[1]
+        dates += [d for d in (date(year, month, last), date(year, month, 15)) if d < today]
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    return [datetime.combine(d, datetime.min.time()) for d in dates[:n]]
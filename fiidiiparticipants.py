@@ -1,27 +1,22 @@
-import aiohttp
 import asyncio
 import pandas as pd
 import io
 import os
-import json
-from datetime import date, timedelta
+import sys
+from datetime import date
 from dateutil.relativedelta import relativedelta
 import gspread
-from google.oauth2.service_account import Credentials
+from nse_downloader import ArchiveDownloader
+from archive_cache import ArchiveCache
+from trading_calendar import is_trading_day, trading_days
+from participant_store import ParticipantStore
+from sheet_sync import sync_dataframe, describe
+from shared_clients import open_spreadsheet
+import metrics
 
-# Get credentials and Sheet ID
-credentials_json = os.getenv('GOOGLE_SHEETS_CREDENTIALS')
 SHEET_ID = "1IUChF0UFKMqVLxTI69lXBi-g48f-oTYqI1K9miipKgY"
-
-if not credentials_json:
-    raise ValueError("GOOGLE_SHEETS_CREDENTIALS environment variable is not set.")
-
-credentials_info = json.loads(credentials_json)
-credentials = Credentials.from_service_account_info(
-    credentials_info,
-    scopes=["https://www.googleapis.com/auth/spreadsheets"]
-)
-client = gspread.authorize(credentials)
+CSV_FILENAME = 'fao_participant_oi_data.csv'
+RETENTION_MONTHS = 6  # Window published to the sheet/CSV; the Parquet store keeps everything
 
 # Headers to mimic browser
 HEADERS = {
@@ -33,77 +28,110 @@ HEADERS = {
     "Chrome/120.0.0.0 Safari/537.36"
 }
 
+# Archive host; override to point at a mirror or local stand-in
+ARCHIVE_URL = os.getenv('NSE_ARCHIVES_URL', 'https://nsearchives.nseindia.com')
+
+# In-flight cap and per-host request rate used against nsearchives
+MAX_IN_FLIGHT = int(os.getenv('NSE_MAX_IN_FLIGHT', '8'))
+RATE_PER_HOST = float(os.getenv('NSE_RATE_PER_HOST', '5'))
+
+# Participant OI files are final once a few days old; newer ones get revalidated
+IMMUTABLE_AFTER_DAYS = 3
+
 # Function to download and parse CSV
-async def fetch_data(session, date_obj):
-    if date_obj.weekday() >= 5:  # Skip weekends
+@metrics.timed()
+async def fetch_data(downloader, date_obj):
+    if not is_trading_day(date_obj):  # Skip weekends and exchange holidays
         return None
 
     date_str = date_obj.strftime("%d%m%Y")
-    url = f'https://nsearchives.nseindia.com/content/nsccl/fao_participant_oi_{date_str}.csv'
+    url = f'{ARCHIVE_URL}/content/nsccl/fao_participant_oi_{date_str}.csv'
 
+    immutable = (date.today() - date_obj).days > IMMUTABLE_AFTER_DAYS
+    content = await downloader.get(url, label=date_obj.strftime('%d-%m-%Y'), immutable=immutable)
+    if content is None:
+        return None
     try:
-        async with session.get(url, headers=HEADERS, timeout=10) as response:
-            if response.status == 200:
-                content = await response.read()
-                df = pd.read_csv(io.StringIO(content.decode('utf-8')), skiprows=1)
-                df['Date'] = date_obj.strftime("%d-%m-%Y")
-                print(f"✅ Done for {date_obj.strftime('%d-%m-%Y')}")
-                return df
-            else:
-                print(f"❌ Error {response.status} fetching {date_obj.strftime('%d-%m-%Y')}")
-                return None
+        df = pd.read_csv(io.StringIO(content.decode('utf-8')), skiprows=1)
     except Exception as e:
-        print(f"❌ Error fetching {date_obj.strftime('%d-%m-%Y')}: {e}")
+        print(f"❌ Error parsing {date_obj.strftime('%d-%m-%Y')}: {e}")
         return None
+    df['Date'] = date_obj.strftime("%d-%m-%Y")
+    print(f"✅ Done for {date_obj.strftime('%d-%m-%Y')}")
+    return df
 
-async def main():
-    end_date = date.today()
-    start_date = end_date - relativedelta(months=6)
-    delta = timedelta(days=1)
-
-    tasks = []
-    async with aiohttp.ClientSession() as session:
-        current = start_date
-        while current <= end_date:
-            tasks.append(fetch_data(session, current))
-            current += delta
+def missing_dates(stored, start_date, end_date):
+    """Trading days in [start_date, end_date] not yet present in the store."""
+    return [d for d in trading_days(start_date, end_date) if d not in stored]
 
-        results = await asyncio.gather(*tasks)
+async def main(incremental=True, export_csv=True):
+    end_date = date.today()
+    start_date = end_date - relativedelta(months=RETENTION_MONTHS)
+
+    store = ParticipantStore()
+    if not store.dates() and os.path.exists(CSV_FILENAME):
+        print(f"📦 Importing {CSV_FILENAME} into {store.root}")
+        store.import_csv(CSV_FILENAME)
+
+    stored = store.dates() if incremental else set()
+    dates = missing_dates(stored, start_date, end_date)
+    print(f"📅 {len(dates)} trading day(s) to fetch ({'incremental' if stored else 'full'} run)")
+
+    results = []
+    if dates:
+        cache = ArchiveCache()
+        async with ArchiveDownloader(HEADERS, max_in_flight=MAX_IN_FLIGHT, rate_per_host=RATE_PER_HOST,
+                                     cache=cache) as downloader:
+            tasks = [fetch_data(downloader, d) for d in dates]
+            results = await asyncio.gather(*tasks)
+        print(f"📊 Downloads: {downloader.summary()}")
+        cache.evict()
 
     # Filter non-empty dataframes
     valid_data = [df for df in results if df is not None]
-
-    if not valid_data:
+    if valid_data:
+        with metrics.stage("store_upsert"):
+            written = store.upsert(pd.concat(valid_data, ignore_index=True))
+        print(f"✅ Stored {written} new trading day(s) in {store.root}")
+    else:
+        print("ℹ️ No new trading days published.")
+
+    with metrics.stage("store_read"):
+        df_all = store.read(start_date, end_date)
+    if df_all.empty:
         print("❌ No data fetched for any date.")
         return
-
-    df_all = pd.concat(valid_data, ignore_index=True)
+    df_all = ParticipantStore.to_export(df_all)
 
     upload_to_google_sheets(df_all)
-    save_to_csv(df_all)
+    if export_csv:
+        save_to_csv(df_all)
     print("✅ Data processing completed.")
 
+@metrics.timed()
 def upload_to_google_sheets(df):
     try:
-        sheet = client.open_by_key(SHEET_ID)
+        sheet = open_spreadsheet(SHEET_ID)
         try:
             worksheet = sheet.worksheet("FiiDii_OI_Row")
         except gspread.exceptions.WorksheetNotFound:
             worksheet = sheet.add_worksheet("FiiDii_OI_Row", rows=str(len(df)+1), cols=str(len(df.columns)))
 
-        worksheet.clear()
-        df_cleaned = df.replace([float('inf'), float('-inf')], None).fillna('')
-        worksheet.update([df_cleaned.columns.values.tolist()] + df_cleaned.values.tolist(), value_input_option='RAW')
-        print("✅ Uploaded to Google Sheets.")
+        report = sync_dataframe(worksheet, df, key_columns=['Date', 'Client Type'], value_input_option='RAW')
+        print(f"✅ Uploaded to Google Sheets ({describe(report)}).")
     except Exception as e:
         print(f"❌ Google Sheets upload error: {e}")
 
+@metrics.timed()
 def save_to_csv(df):
     try:
-        df.to_csv('fao_participant_oi_data.csv', index=False)
-        print("✅ Saved to fao_participant_oi_data.csv")
+        df.to_csv(CSV_FILENAME, index=False)
+        print(f"✅ Saved to {CSV_FILENAME}")
     except Exception as e:
         print(f"❌ CSV save error: {e}")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # --full re-downloads the whole window; --no-csv skips the CSV export
+    args = sys.argv[1:]
+    asyncio.run(main(incremental="--full" not in args, export_csv="--no-csv" not in args))
+    metrics.write_report("fiidiiparticipants")
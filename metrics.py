@@ -0,0 +1,149 @@
+"""Per-run performance metrics: stage timers, counters and peak memory.
+
+Time a block with `with stage("upload"):` or a function with
+`@timed("fetch_data")` (plain or async), bump counters with
+`count("http_requests")`, and call `write_report("fiidiiparticipants")` at
+the end of the run to write a JSON report to METRICS_DIR.
+
+Set PROFILE_STAGES to a comma-separated list of stage names (or "all") to
+also dump a cProfile .prof file per stage next to the report.
+"""
+import asyncio
+import cProfile
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+METRICS_DIR = os.getenv("METRICS_DIR", ".cache/metrics")
+PROFILE_STAGES = {s.strip() for s in os.getenv("PROFILE_STAGES", "").split(",") if s.strip()}
+
+_lock = threading.Lock()
+_local = threading.local()
+_started = time.time()
+_stages = {}
+_counters = {}
+_profiles = {}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def count(name, n=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def _profiler(name):
+    """The stage's profiler, unless profiling is off for it or another stage is profiling this thread."""
+    if not (name in PROFILE_STAGES or "all" in PROFILE_STAGES) or getattr(_local, "profiling", False):
+        return None
+    with _lock:
+        return _profiles.setdefault(name, cProfile.Profile())
+
+
+@contextmanager
+def stage(name):
+    """Record the wall time of the block under `name`; repeated stages are aggregated."""
+    profiler = _profiler(name)
+    if profiler:
+        _local.profiling = True
+        profiler.enable()
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if profiler:
+            profiler.disable()
+            _local.profiling = False
+        rss_after = peak_rss_mb()
+        with _lock:
+            s = _stages.setdefault(name, {"calls": 0, "seconds": 0.0, "max_seconds": 0.0,
+                                          "peak_rss_mb": None, "peak_growth_mb": 0.0})
+            s["calls"] += 1
+            s["seconds"] += elapsed
+            s["max_seconds"] = max(s["max_seconds"], elapsed)
+            if rss_after is not None:
+                s["peak_rss_mb"] = max(s["peak_rss_mb"] or 0, rss_after)
+                s["peak_growth_mb"] = round(max(s["peak_growth_mb"], rss_after - rss_before), 1)
+
+
+def timed(name=None):
+    """Decorator form of `stage`, defaulting to the function's name."""
+    def decorate(func):
+        label = name or func.__name__
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with stage(label):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def snapshot():
+    with _lock:
+        stages = {name: dict(s, seconds=round(s["seconds"], 4), max_seconds=round(s["max_seconds"], 4))
+                  for name, s in _stages.items()}
+        return {
+            "started": datetime.fromtimestamp(_started).isoformat(timespec="seconds"),
+            "elapsed_seconds": round(time.time() - _started, 3),
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": stages,
+            "counters": dict(_counters),
+        }
+
+
+def reset():
+    global _started
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+        _profiles.clear()
+        _started = time.time()
+
+
+def write_report(job, directory=METRICS_DIR):
+    """Write this run's metrics (and any stage profiles) to `directory`; returns the report path."""
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.fromtimestamp(_started).strftime("%Y%m%d-%H%M%S")
+    report = dict(snapshot(), job=job, argv=sys.argv[1:])
+
+    with _lock:
+        profiles = list(_profiles.items())
+    report["profiles"] = {}
+    for name, profiler in profiles:
+        path = os.path.join(directory, f"{job}-{stamp}-{name}.prof")
+        profiler.dump_stats(path)
+        report["profiles"][name] = path
+
+    path = os.path.join(directory, f"{job}-{stamp}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    slowest = sorted(report["stages"].items(), key=lambda kv: -kv[1]["seconds"])[:3]
+    top = ", ".join(f"{name} {s['seconds']:.1f}s" for name, s in slowest)
+    print(f"⏱️ Metrics written to {path}" + (f" (slowest: {top})" if top else ""))
+    return path
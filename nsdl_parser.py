@@ -0,0 +1,134 @@
+import re
+
+import numpy as np
+import pandas as pd
+from lxml import html
+
+_WS = re.compile(r"\s+")
+
+
+def _number(text):
+    if text is None:
+        return float("nan")
+    try:
+        return float(text.replace(",", ""))
+    except ValueError:
+        return float("nan")
+
+
+# ================== TABLE WALK ==================
+def _table_rows(content):
+    """Expand the first <table> into a dense list of text rows in one pass.
+
+    rowspan/colspan cells are repeated into every grid slot they cover, the
+    same way pd.read_html lays them out; empty cells become None.
+    """
+    doc = html.fromstring(content)
+    table = doc.find(".//table")
+    if table is None:
+        return None
+
+    rows, carry = [], {}  # carry: col -> (text, rows_left) for active rowspans
+    for tr in table.iter("tr"):
+        row, col = [], 0
+        cells = [c for c in tr if c.tag in ("td", "th")]
+        i = 0
+        while i < len(cells) or col in carry:
+            if col in carry:
+                text, left = carry[col]
+                row.append(text)
+                if left > 1:
+                    carry[col] = (text, left - 1)
+                else:
+                    del carry[col]
+                col += 1
+                continue
+            cell = cells[i]
+            i += 1
+            text = _WS.sub(" ", cell.text_content()).strip() or None
+            span = int(cell.get("colspan", 1) or 1)
+            down = int(cell.get("rowspan", 1) or 1)
+            for _ in range(span):
+                if down > 1:
+                    carry[col] = (text, down - 1)
+                row.append(text)
+                col += 1
+        rows.append(row)
+
+    width = max((len(r) for r in rows), default=0)
+    return [r + [None] * (width - len(r)) for r in rows]
+
+
+# ================== HEADER CLASSIFICATION ==================
+def classify_columns(header_rows, report_date):
+    """Pick the AUC and Net Investment (INR) columns from the header block.
+
+    Returns two lists of (column index, name) in table order, with the same
+    naming rules the sheet has always used.
+    """
+    width = len(header_rows[0]) if header_rows else 0
+    target_str = f"AUC as on {report_date.strftime('%B %d, %Y')}".lower()
+
+    auc, net = [], []
+    equity_count = total_count = 0
+    for col_idx in range(2, width):
+        col_text = " ".join(r[col_idx] for r in header_rows if r[col_idx] is not None).lower()
+        is_inr = "inr" in col_text and "usd" not in col_text
+
+        if is_inr and target_str in col_text:
+            if "equity" in col_text:
+                equity_count += 1
+                auc.append((col_idx, "AUC_Equity_Cr" if equity_count == 1 else f"AUC_Equity_Cr_{equity_count}"))
+            elif "total" in col_text:
+                total_count += 1
+                auc.append((col_idx, "AUC_Total_Cr" if total_count == 1 else f"AUC_Total_Cr_{total_count}"))
+            else:
+                auc.append((col_idx, f"AUC_Col_{col_idx}"))
+
+        if is_inr and ("net investment" in col_text or "net inv" in col_text):
+            if "equity" in col_text:
+                net.append((col_idx, "Net_Equity_Cr"))
+            elif "total" in col_text:
+                net.append((col_idx, "Net_Total_Cr"))
+            else:
+                net.append((col_idx, f"Net_Col_{col_idx}"))
+
+    # Several fortnights carry Net columns; keep the 3rd Equity and 2nd Total
+    # (the latest fortnight), or the first one when fewer exist
+    equity = [i for i, (_, name) in enumerate(net) if name == "Net_Equity_Cr"]
+    total = [i for i, (_, name) in enumerate(net) if name == "Net_Total_Cr"]
+    keep_equity = equity[2] if len(equity) >= 3 else (equity[0] if equity else None)
+    keep_total = total[1] if len(total) >= 2 else (total[0] if total else None)
+    net = [c for i, c in enumerate(net)
+           if c[1] not in ("Net_Equity_Cr", "Net_Total_Cr") or i in (keep_equity, keep_total)]
+    return auc, net
+
+
+# ================== PARSER ==================
+def parse_sector_table(content, report_date):
+    """Parse an NSDL FIIInvestSector page into the typed per-sector frame.
+
+    Columns: Sr_No, Sector, AUC_* (INR crore), Report_Date, Net_* (INR crore).
+    Returns None if the page has no table or no data rows.
+    """
+    rows = _table_rows(content)
+    if not rows:
+        return None
+
+    data_start = next((i for i, r in enumerate(rows) if (r[0] or "").strip() in ("1", "1.0")), None)
+    if data_start is None:
+        return None
+
+    auc, net = classify_columns(rows[:data_start], report_date)
+    data = rows[data_start:]
+
+    out = {
+        "Sr_No": pd.array([_number(r[0]) for r in data], dtype="Float64").astype("Int64"),
+        "Sector": [r[1] for r in data],
+    }
+    for idx, name in auc:
+        out[name] = np.array([_number(r[idx]) for r in data])
+    out["Report_Date"] = report_date.strftime("%Y-%m-%d")
+    for idx, name in net:
+        out[name] = np.array([_number(r[idx]) for r in data])
+    return pd.DataFrame(out)
@@ -0,0 +1,186 @@
+import calendar
+import json
+import os
+import re
+from datetime import datetime, timedelta
+
+from shared_clients import get_http_session
+
+BASE_URL = "https://www.fpi.nsdl.co.in/web/StaticReports/Fortnightly_Sector_wise_FII_Investment_Data/FIIInvestSector_{}.html"
+LISTING_URL = os.getenv("NSDL_LISTING_URL", "https://www.fpi.nsdl.co.in/web/Reports/FPI_Fortnightly_Selection.aspx")
+URLS_FILE = os.getenv("NSDL_URLS_FILE", "data/nsdl_report_urls.json")
+# A fortnight nothing was found for is searched again only after this long;
+# once it is FINAL_AFTER_DAYS old, only every FINAL_RETRY_DAYS
+MISS_RETRY_HOURS = float(os.getenv("NSDL_MISS_RETRY_HOURS", "24"))
+FINAL_AFTER_DAYS = 60
+FINAL_RETRY_DAYS = 30
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+}
+
+_FILENAME_RE = re.compile(r"FIIInvestSector_([A-Za-z]+)(\d{1,2})(\d{4})\.html")
+_LONG_DATE_RE = re.compile(r"\b([A-Z][a-z]+)\.? (\d{1,2}), (\d{4})\b")
+
+
+# ================== CANDIDATES ==================
+def month_spellings(dt):
+    """Month tokens NSDL has used in filenames, most likely first."""
+    short, full = dt.strftime("%b"), dt.strftime("%B")
+    spellings = [full, short] if full in ("June", "July") else [short, full]
+    if short == "Sep":
+        spellings.append("Sept")
+    return spellings
+
+
+def candidate_days(nominal):
+    """Publication days to try for the fortnight ending on `nominal` (15th or month-end)."""
+    if nominal.day == 15:
+        days = [15, 14, 13, 16, 12]
+    else:
+        last = calendar.monthrange(nominal.year, nominal.month)[1]
+        days = [last, last - 1, last - 2, last - 3]
+    return [nominal.replace(day=d) for d in days]
+
+
+def candidate_urls(nominal):
+    for dt in candidate_days(nominal):
+        for month in month_spellings(dt):
+            yield dt, BASE_URL.format(f"{month}{dt.day:02d}{dt.year}")
+
+
+def _fortnight_key(dt):
+    """Nominal fortnight (15th or month-end) that a publication date belongs to."""
+    if dt.day <= 20:
+        return dt.replace(day=15).strftime("%Y-%m-%d")
+    return dt.replace(day=calendar.monthrange(dt.year, dt.month)[1]).strftime("%Y-%m-%d")
+
+
+# ================== RESOLVER ==================
+class ReportResolver:
+    """Maps nominal fortnight dates to the report URL NSDL actually published.
+
+    Resolved entries are persisted in URLS_FILE as
+    {"YYYY-MM-DD" (nominal): {"date": "YYYY-MM-DD" (published), "url": ...}}
+    so a fortnight is only ever searched for once. Misses are saved as
+    {"missed_at": unix time} and not searched for again until they are due.
+    """
+
+    def __init__(self, path=URLS_FILE, session=None):
+        self.path = path
+        self.session = session or get_http_session()
+        self.mapping = {}
+        self.probes = 0
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.mapping = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"❌ Could not read {path}: {e}")
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump(dict(sorted(self.mapping.items(), reverse=True)), f, indent=1)
+
+    def _exists(self, url):
+        self.probes += 1
+        try:
+            response = self.session.head(url, headers=HEADERS, timeout=10, allow_redirects=True)
+            if response.status_code == 405:
+                response = self.session.get(url, headers=HEADERS, timeout=10, stream=True)
+                response.close()
+            return response.status_code == 200
+        except Exception as e:
+            print(f"Probe failed for {url}: {e}")
+            return False
+
+    def _from_listing(self, wanted):
+        """Fill in what the NSDL report listing page tells us; returns the number found."""
+        try:
+            response = self.session.get(LISTING_URL, headers=HEADERS, timeout=20)
+            response.raise_for_status()
+        except Exception as e:
+            print(f"Listing page unavailable ({e}); falling back to probes")
+            return 0
+
+        text = response.text
+        found = 0
+        for month, day, year in _FILENAME_RE.findall(text):
+            for fmt in ("%b", "%B"):
+                try:
+                    dt = datetime.strptime(f"{month[:3] if month == 'Sept' else month} {day} {year}", f"{fmt} %d %Y")
+                except ValueError:
+                    continue
+                key = _fortnight_key(dt)
+                if key in wanted and not self._found(key):
+                    self.mapping[key] = {"date": dt.strftime("%Y-%m-%d"),
+                                         "url": BASE_URL.format(f"{month}{int(day):02d}{year}")}
+                    found += 1
+                break
+
+        # Listings that only show dates still narrow the probes to one day
+        for month, day, year in _LONG_DATE_RE.findall(text):
+            try:
+                dt = datetime.strptime(f"{month} {day} {year}", "%B %d %Y")
+            except ValueError:
+                continue
+            key = _fortnight_key(dt)
+            if key in wanted and not self._found(key):
+                for spelling in month_spellings(dt):
+                    url = BASE_URL.format(f"{spelling}{dt.day:02d}{dt.year}")
+                    if self._exists(url):
+                        self.mapping[key] = {"date": dt.strftime("%Y-%m-%d"), "url": url}
+                        found += 1
+                        break
+        return found
+
+    def _found(self, key):
+        return "url" in self.mapping.get(key, {})
+
+    def _due(self, key, now):
+        """True when `key` was never searched for, or its last miss has aged past the back-off."""
+        entry = self.mapping.get(key)
+        if entry is None:
+            return True
+        if "url" in entry:
+            return False
+        age = now - datetime.strptime(key, "%Y-%m-%d")
+        wait = timedelta(days=FINAL_RETRY_DAYS) if age > timedelta(days=FINAL_AFTER_DAYS) \
+            else timedelta(hours=MISS_RETRY_HOURS)
+        return now.timestamp() - entry.get("missed_at", 0) >= wait.total_seconds()
+
+    def resolve(self, nominal_dates, use_listing=True):
+        """Return {nominal date: (published datetime, url)} for every fortnight found.
+
+        Fortnights that have not ended yet are not searched for.
+        """
+        today = datetime.now()
+        before = json.dumps(self.mapping, sort_keys=True)
+        pending = {d.strftime("%Y-%m-%d") for d in nominal_dates
+                   if self._due(d.strftime("%Y-%m-%d"), today) and d.date() <= today.date()}
+
+        if pending and use_listing:
+            self._from_listing(pending)
+            pending = {key for key in pending if not self._found(key)}
+
+        for key in sorted(pending, reverse=True):
+            nominal = datetime.strptime(key, "%Y-%m-%d")
+            for dt, url in candidate_urls(nominal):
+                if dt.date() > today.date() + timedelta(days=1):
+                    continue
+                if self._exists(url):
+                    self.mapping[key] = {"date": dt.strftime("%Y-%m-%d"), "url": url}
+                    break
+            else:
+                print(f"No published report found for fortnight {key}")
+                self.mapping[key] = {"missed_at": today.timestamp()}
+
+        if json.dumps(self.mapping, sort_keys=True) != before:
+            self.save()
+
+        resolved = {}
+        for d in nominal_dates:
+            entry = self.mapping.get(d.strftime("%Y-%m-%d"))
+            if entry and "url" in entry:
+                resolved[d] = (datetime.strptime(entry["date"], "%Y-%m-%d"), entry["url"])
+        return resolved
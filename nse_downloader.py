@@ -0,0 +1,171 @@
+import asyncio
+import random
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from metrics import count
+
+# Status codes NSE returns when throttling or briefly unavailable
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class HostRateLimiter:
+    """Spaces out request starts so no host sees more than `rate` requests per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next_slot = {}
+        self._lock = asyncio.Lock()
+
+    async def wait(self, host):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class TokenBucket:
+    """Token-bucket limiter: `rate` requests per second on average, bursts up to `capacity`.
+
+    Has the same `wait(host)` interface as HostRateLimiter; the bucket is
+    shared by all hosts.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def wait(self, host=None):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ArchiveDownloader:
+    """Bounded-concurrency, retrying downloader for NSE archive files.
+
+    Use as an async context manager; `get()` returns the response body or None
+    when the file is missing (404) or every attempt failed. `stats` counts the
+    outcome per URL so callers can report how the run went. When an
+    ArchiveCache is given, cached bodies are served or revalidated first.
+    """
+
+    def __init__(self, headers=None, max_in_flight=8, rate_per_host=5.0,
+                 retries=4, timeout=15, backoff_base=0.5, backoff_cap=20.0, cache=None, limiter=None):
+        self.headers = headers or {}
+        self.cache = cache
+        self.max_in_flight = max_in_flight
+        self.retries = retries
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.limiter = limiter or HostRateLimiter(rate_per_host)
+        self.stats = {"succeeded": 0, "cached": 0, "retried": 0, "failed": 0, "missing": 0}
+        self._semaphore = None
+        self.session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.max_in_flight,
+            limit_per_host=self.max_in_flight,
+            ttl_dns_cache=300,
+            keepalive_timeout=30,
+        )
+        self.session = aiohttp.ClientSession(connector=connector, headers=self.headers, timeout=self.timeout)
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_cap)
+            except ValueError:
+                pass
+        # Full jitter: uniform in [0, base * 2^attempt], capped
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    async def get(self, url, label=None, headers=None, immutable=False):
+        label = label or url
+        host = urlsplit(url).netloc
+        retried = False
+
+        entry = self.cache.lookup(url) if self.cache else None
+        if entry and self.cache.is_fresh(entry, immutable):
+            self.cache.hits += 1
+            self.stats["cached"] += 1
+            count("cache_hits")
+            return self.cache.read(url)
+        if entry:
+            headers = dict(headers or {})
+            headers.update(self.cache.validators(entry))
+
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            async with self._semaphore:
+                await self.limiter.wait(host)
+                count("http_requests")
+                try:
+                    async with self.session.get(url, headers=headers) as response:
+                        if response.status == 200:
+                            body = await response.read()
+                            self.stats["succeeded"] += 1
+                            count("http_bytes", len(body))
+                            if self.cache:
+                                self.cache.store(url, body, response.headers)
+                                self.cache.misses += 1
+                            return body
+                        if response.status == 304 and entry:
+                            self.cache.touch(url)
+                            self.cache.revalidated += 1
+                            self.stats["cached"] += 1
+                            count("cache_revalidated")
+                            return self.cache.read(url)
+                        if response.status == 404:
+                            self.stats["missing"] += 1
+                            print(f"❌ Error 404 fetching {label}")
+                            return None
+                        if response.status not in RETRY_STATUSES:
+                            self.stats["failed"] += 1
+                            print(f"❌ Error {response.status} fetching {label}")
+                            return None
+                        retry_after = response.headers.get("Retry-After")
+                        reason = f"HTTP {response.status}"
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    reason = str(e) or type(e).__name__
+
+            if attempt == self.retries:
+                break
+            if not retried:
+                retried = True
+                self.stats["retried"] += 1
+            count("http_retries")
+            delay = self._backoff(attempt, retry_after)
+            print(f"🔁 Retry {attempt + 1}/{self.retries} for {label} in {delay:.1f}s ({reason})")
+            await asyncio.sleep(delay)
+
+        self.stats["failed"] += 1
+        print(f"❌ Giving up on {label} after {self.retries + 1} attempts")
+        return None
+
+    def summary(self):
+        s = self.stats
+        return (f"{s['succeeded']} succeeded, {s['cached']} from cache, {s['retried']} retried, "
+                f"{s['failed']} failed, {s['missing']} not published")
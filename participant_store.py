@@ -0,0 +1,113 @@
+import os
+import shutil
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+STORE_DIR = os.getenv("PARTICIPANT_STORE_DIR", "data/participant_oi")
+DATE_FORMAT = "%d-%m-%Y"  # Format of the Date column in the CSV export and Google Sheet
+KEY_COLUMNS = ["Date", "Client Type"]
+
+
+class ParticipantStore:
+    """Date-partitioned Parquet store for participant-wise OI rows.
+
+    Each trading day lives in its own `date=YYYY-MM-DD/part-0.parquet`
+    file with typed columns (Date as date32, contract counts as int64), so
+    appending a day touches one small file and range reads only open the
+    partitions they need.
+    """
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def _partition(self, day):
+        return os.path.join(self.root, f"date={day.isoformat()}")
+
+    def dates(self):
+        """Trading days held in the store, taken from the partition names."""
+        days = set()
+        for name in os.listdir(self.root):
+            if name.startswith("date="):
+                days.add(datetime.strptime(name[5:], "%Y-%m-%d").date())
+        return days
+
+    @staticmethod
+    def _typed(df):
+        df = df.copy()
+        if not pd.api.types.is_datetime64_any_dtype(df["Date"]):
+            df["Date"] = pd.to_datetime(df["Date"], format=DATE_FORMAT)
+        df["Client Type"] = df["Client Type"].astype(str).str.strip()
+        for col in df.columns:
+            if col not in KEY_COLUMNS:
+                df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
+        return df
+
+    def upsert(self, df):
+        """Insert or replace rows by (Date, Client Type); returns the number of days written."""
+        if df is None or df.empty:
+            return 0
+        df = self._typed(df)
+        written = 0
+        for ts, rows in df.groupby("Date", sort=True):
+            day = ts.date()
+            path = os.path.join(self._partition(day), "part-0.parquet")
+            if os.path.exists(path):
+                existing = pd.read_parquet(path)
+                existing["Date"] = pd.to_datetime(existing["Date"])
+                rows = pd.concat([existing, rows], ignore_index=True)
+                rows = rows.drop_duplicates(subset=KEY_COLUMNS, keep="last")
+            os.makedirs(self._partition(day), exist_ok=True)
+            table = pa.Table.from_pandas(rows.reset_index(drop=True), preserve_index=False)
+            table = table.set_column(table.schema.get_field_index("Date"), "Date",
+                                     pc.cast(table["Date"], pa.date32()))
+            tmp = path + ".tmp"
+            pq.write_table(table, tmp)
+            os.replace(tmp, path)
+            written += 1
+        return written
+
+    def read(self, start=None, end=None, clients=None):
+        """Rows between start and end (inclusive dates), optionally only for some client types."""
+        days = sorted(d for d in self.dates()
+                      if (start is None or d >= start) and (end is None or d <= end))
+        if not days:
+            return pd.DataFrame()
+        files = [os.path.join(self._partition(d), "part-0.parquet") for d in days]
+        dataset = ds.dataset(files, format="parquet")
+        flt = ds.field("Client Type").isin(list(clients)) if clients else None
+        df = dataset.to_table(filter=flt).to_pandas(ignore_metadata=True)
+        df["Date"] = pd.to_datetime(df["Date"])
+        return df.sort_values("Date", kind="stable").reset_index(drop=True)
+
+    def prune(self, before):
+        """Drop whole partitions older than `before`."""
+        removed = 0
+        for day in self.dates():
+            if day < before:
+                shutil.rmtree(self._partition(day))
+                removed += 1
+        return removed
+
+    def import_csv(self, path):
+        """One-off migration of an existing CSV history into the store."""
+        df = pd.read_csv(path)
+        return self.upsert(df)
+
+    @staticmethod
+    def to_export(df):
+        """Frame in the legacy CSV/Sheet layout: Date last, formatted DD-MM-YYYY."""
+        df = df.copy()
+        df["Date"] = df["Date"].dt.strftime(DATE_FORMAT)
+        cols = [c for c in df.columns if c != "Date"] + ["Date"]
+        return df[cols]
+
+    def export_csv(self, path, start=None, end=None):
+        df = self.read(start, end)
+        self.to_export(df).to_csv(path, index=False)
+        return len(df)
@@ -0,0 +1,127 @@
+"""Local computation of the Fiiparticipants!D30:J54 summary block.
+
+The sheet derives, for each client type and instrument, the net open
+position, its change since the previous trading day, whether the
+participant bought or sold net, the Bullish/Bearish reading and the
+long-short ratio. This module computes the same block for every client
+and instrument at once from the participant OI history with numpy.
+"""
+import os
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from participant_store import ParticipantStore
+
+CSV_FILENAME = "fao_participant_oi_data.csv"
+
+# (block label in the report, Client Type value in the OI data), in sheet order
+CLIENTS = [("Client", "Client"), ("FII", "FII"), ("PRO", "Pro"), ("DII", "DII")]
+
+# (row label, long column, short column). The sheet's Stock Future row only
+# reads the long leg, so its net is the long position and its ratio is 100.
+INSTRUMENTS = [
+    ("Stock Future", "Future Stock Long", None),
+    ("Index Future", "Future Index Long", "Future Index Short"),
+    ("Index Call", "Option Index Call Long", "Option Index Call Short"),
+    ("Index Put", "Option Index Put Long", "Option Index Put Short"),
+]
+PUT_ROWS = {"Index Put"}  # Buying puts is bearish, so the reading flips
+
+BLOCK_HEADER = ["Net Position", "Today Net change", "Position", "Interpretation", "Long-Short Ratio"]
+SUMMARY_COLUMNS = ["Client", "Instrument"] + BLOCK_HEADER
+DATE_FORMAT = "%d-%b-%Y"  # How the sheet shows the report date
+
+
+def load_history(days=10, store=None):
+    """Recent participant OI rows from the Parquet store, or the CSV when the store is empty."""
+    store = store or ParticipantStore()
+    stored = store.dates()
+    if stored:
+        df = store.read(start=max(stored) - timedelta(days=days))
+    elif os.path.exists(CSV_FILENAME):
+        df = pd.read_csv(CSV_FILENAME)
+        df["Date"] = pd.to_datetime(df["Date"], format="%d-%m-%Y")
+    else:
+        return pd.DataFrame()
+    df.columns = df.columns.str.strip()
+    df["Client Type"] = df["Client Type"].astype(str).str.strip()
+    return df
+
+
+def _legs(day_rows):
+    """(long, short) arrays of shape (clients, instruments) for one trading day."""
+    rows = day_rows.set_index("Client Type").reindex([c for _, c in CLIENTS])
+    long = np.column_stack([rows[lc].to_numpy(dtype="float64") for _, lc, _ in INSTRUMENTS])
+    short = np.column_stack([
+        rows[sc].to_numpy(dtype="float64") if sc else np.zeros(len(CLIENTS)) for _, _, sc in INSTRUMENTS
+    ])
+    return long, short
+
+
+def compute_summary(history):
+    """Summary for the latest trading day in `history` against the one before it.
+
+    Returns (report date, frame with one row per client and instrument).
+    """
+    days = sorted(history["Date"].unique())
+    if len(days) < 2:
+        raise ValueError("At least two trading days of participant data are needed")
+    today, previous = days[-1], days[-2]
+
+    long, short = _legs(history[history["Date"] == today])
+    prev_long, prev_short = _legs(history[history["Date"] == previous])
+
+    net = long - short
+    change = net - (prev_long - prev_short)
+    gross = long + short
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = np.where(gross > 0, long / gross * 100, 0.0)
+
+    bought = change > 0
+    puts = np.array([label in PUT_ROWS for label, _, _ in INSTRUMENTS])
+    bullish = bought ^ puts  # broadcast across clients
+
+    shape = net.shape
+    frame = pd.DataFrame({
+        "Client": np.repeat([label for label, _ in CLIENTS], shape[1]),
+        "Instrument": np.tile([label for label, _, _ in INSTRUMENTS], shape[0]),
+        "Net Position": net.ravel().astype("int64"),
+        "Today Net change": change.ravel().astype("int64"),
+        "Position": np.where(bought, "Bought net", "Sold net").ravel(),
+        "Interpretation": np.where(bullish, "Bullish", "Bearish").ravel(),
+        "Long-Short Ratio": ratio.ravel().round(2),
+    })
+    return pd.Timestamp(today), frame
+
+
+def summary_values(report_date, frame):
+    """Lay the summary out exactly like the D30:J54 values the sheet returns."""
+    fii_index = frame[(frame["Client"] == "FII") & (frame["Instrument"] == "Index Future")]
+    fii_long = float(fii_index["Long-Short Ratio"].iloc[0])
+    values = [["Date", report_date.strftime(DATE_FORMAT), "", "FII Long/Short ", "Index (%)",
+               f"{fii_long:.2f}", f"{100 - fii_long:.2f}"]]
+
+    for n, (label, _) in enumerate(CLIENTS):
+        if n:
+            values.append([])
+        values.append(["", label] + BLOCK_HEADER)
+        block = frame[frame["Client"] == label]
+        for i, row in enumerate(block.itertuples(index=False)):
+            values.append([
+                "Summary" if i == 1 else "",
+                row.Instrument,
+                str(row[2]),
+                str(row[3]),
+                row.Position,
+                row.Interpretation,
+                f"{row[6]:.2f}",
+            ])
+    return values
+
+
+def build_summary(days=10, store=None):
+    """(values in the sheet_data.json layout, report date) from local participant data."""
+    report_date, frame = compute_summary(load_history(days, store))
+    return summary_values(report_date, frame), report_date
@@ -0,0 +1,113 @@
+import io
+
+import ijson
+import pandas as pd
+
+# Columns kept from each corporates-pit record, in output order
+PIT_COLUMNS = [
+    "acqMode", "acqName", "acqfromDt", "acqtoDt", "afterAcqSharesNo", "afterAcqSharesPer",
+    "befAcqSharesNo", "befAcqSharesPer", "company", "date", "intimDt", "personCategory",
+    "secAcq", "secType", "secVal", "securitiesTypePost", "symbol", "tdpTransactionType",
+]
+
+# Records are dropped while parsing unless every listed field is one of the allowed values
+FILTERS = {
+    "acqMode": {"Market Purchase", "Market Sale"},
+    "personCategory": {"Promoters", "Promoter Group", "Director"},
+    "secType": {"Equity Shares"},
+}
+
+CATEGORY_COLUMNS = ["acqMode", "personCategory", "secType", "securitiesTypePost", "tdpTransactionType"]
+SHARE_COLUMNS = ["secAcq"]  # Share counts, whole numbers
+VALUE_COLUMNS = ["secVal"]  # Rupee values, may carry paise
+QUANTITY_COLUMNS = SHARE_COLUMNS + VALUE_COLUMNS
+DATE_COLUMNS = ["date", "intimDt", "acqfromDt", "acqtoDt"]
+MISSING_QUANTITY = "-"  # How NSE writes an absent quantity
+
+
+def _plain_number(value):
+    """Rupees to at most two decimals, without a trailing .0 for whole amounts."""
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+def _text(value):
+    if value is None:
+        return ""
+    return str(value)
+
+
+class PitColumns:
+    """Column-wise accumulator that keeps only filtered, projected fields.
+
+    Feed it one or more corporates-pit payloads with `add`; nothing wider
+    than PIT_COLUMNS is ever held, and rejected records are dropped as soon
+    as they are parsed.
+    """
+
+    def __init__(self, columns=PIT_COLUMNS, filters=FILTERS):
+        self.columns = list(columns)
+        self.filters = filters
+        self.values = {c: [] for c in self.columns}
+        self.seen = 0
+        self.kept = 0
+
+    def accept(self, record):
+        for field, allowed in self.filters.items():
+            if record.get(field) not in allowed:
+                return False
+        return True
+
+    def add_record(self, record):
+        self.seen += 1
+        if not self.accept(record):
+            return
+        self.kept += 1
+        for c in self.columns:
+            self.values[c].append(_text(record.get(c)))
+
+    def add(self, payload):
+        """Stream the `data` array of a raw JSON payload (bytes, str or file object)."""
+        if isinstance(payload, (bytes, str)):
+            payload = io.BytesIO(payload.encode() if isinstance(payload, str) else payload)
+        for record in ijson.items(payload, "data.item"):
+            self.add_record(record)
+
+    def frame(self):
+        """Typed frame: categoricals for modes/categories, Int64 share counts, Float64 values, datetime64 dates."""
+        df = pd.DataFrame(self.values, columns=self.columns)
+        for c in CATEGORY_COLUMNS:
+            if c in df.columns:
+                df[c] = df[c].astype("category")
+        for c in QUANTITY_COLUMNS:
+            if c in df.columns:
+                numbers = pd.to_numeric(df[c].str.replace(",", ""), errors="coerce")
+                df[c] = numbers.astype("Int64" if c in SHARE_COLUMNS else "Float64")
+        for c in DATE_COLUMNS:
+            if c in df.columns:
+                df[c] = pd.to_datetime(df[c].replace("", None), errors="coerce")
+        return df
+
+
+def read_payloads(payloads):
+    """Filtered, typed frame built from several raw corporates-pit payloads."""
+    columns = PitColumns()
+    for payload in payloads:
+        columns.add(payload)
+    print(f"Parsed {columns.seen} PIT records, kept {columns.kept} after filters")
+    return columns.frame()
+
+
+def to_export(df):
+    """String frame for CSV / Sheets: YYYY-MM-DD dates, plain numbers, blanks for missing."""
+    out = pd.DataFrame(index=df.index)
+    for c in df.columns:
+        col = df[c]
+        if c in DATE_COLUMNS:
+            out[c] = col.dt.strftime("%Y-%m-%d").fillna("")
+        elif c in VALUE_COLUMNS:
+            out[c] = col.map(_plain_number, na_action="ignore").fillna(MISSING_QUANTITY).astype(str)
+        elif c in QUANTITY_COLUMNS:
+            out[c] = col.astype("string").fillna(MISSING_QUANTITY).astype(str)
+        else:
+            out[c] = col.astype(str).where(col.notna(), "")
+    return out
@@ -0,0 +1,212 @@
+"""SQLite store for NSE insider-trading (PIT) disclosures.
+
+Usage:
+    python pit_store.py net SYMBOL [--days N]      # net promoter buying for SYMBOL
+    python pit_store.py rows SYMBOL [--days N]     # disclosures for SYMBOL
+    python pit_store.py top [--days N] [--limit K] # symbols with the largest net promoter buying
+    python pit_store.py import [CSV]               # load an InsiderTrading_Data.csv export
+"""
+import argparse
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from pit_ingest import PIT_COLUMNS, QUANTITY_COLUMNS, SHARE_COLUMNS
+
+DB_PATH = os.getenv("PIT_DB_PATH", "data/insider_trading.sqlite")
+# Separate trades can share symbol, person, dates, quantity and side, so the
+# holdings before/after, value and intimation/broadcast dates are part of the key
+KEY_COLUMNS = ["symbol", "acqName", "acqfromDt", "acqtoDt", "secAcq", "tdpTransactionType",
+               "befAcqSharesNo", "afterAcqSharesNo", "secVal", "intimDt", "date"]
+PROMOTER_CATEGORIES = ("Promoters", "Promoter Group")
+
+
+def _quoted(columns):
+    return ", ".join(f'"{c}"' for c in columns)
+
+
+# Share counts are integers, rupee values REAL and everything else text
+COLUMN_TYPES = {c: ("INTEGER" if c in SHARE_COLUMNS else "REAL") if c in QUANTITY_COLUMNS else "TEXT"
+                for c in PIT_COLUMNS}
+_COLUMN_DEFS = ",\n    ".join(
+    f'"{c}" {t}' if t != "TEXT" else f'"{c}" TEXT NOT NULL DEFAULT \'\'' for c, t in COLUMN_TYPES.items()
+)
+# A missing quantity is NULL, and NULLs never collide in a UNIQUE constraint,
+# so the key is a unique index that counts missing quantities as equal
+_KEY_EXPR = ", ".join(f'IFNULL("{c}", -1)' if c in QUANTITY_COLUMNS else f'"{c}"' for c in KEY_COLUMNS)
+_KEY_INDEX = f"CREATE UNIQUE INDEX idx_disclosures_key ON disclosures ({_KEY_EXPR})"
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS disclosures (
+    {_COLUMN_DEFS}
+);
+CREATE INDEX IF NOT EXISTS idx_disclosures_symbol ON disclosures (symbol, date);
+CREATE INDEX IF NOT EXISTS idx_disclosures_date ON disclosures (date);
+CREATE INDEX IF NOT EXISTS idx_disclosures_category ON disclosures (personCategory, date);
+"""
+
+
+def _quantity(value, convert=int):
+    try:
+        return convert(str(value).replace(",", ""))
+    except (TypeError, ValueError):
+        return None
+
+
+class PitStore:
+    """PIT disclosures keyed by KEY_COLUMNS.
+
+    Dates are stored as YYYY-MM-DD text so they compare and index correctly;
+    secAcq is an integer share count and secVal a REAL rupee value. Re-inserting a row with the same natural
+    key replaces it, so overlapping fetches never duplicate history.
+    `rebuilt` is True when a store with an older key or column types was migrated on open;
+    rows the old key had collapsed can be recovered by importing the CSV again.
+    """
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.rebuilt = self._migrate()
+        self.conn.executescript(_SCHEMA)
+        self.conn.execute(_KEY_INDEX.replace("INDEX", "INDEX IF NOT EXISTS", 1))
+
+    def _migrate(self):
+        """Rebuild a disclosures table created with a different unique key or column types."""
+        table = self.conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'disclosures'").fetchone()
+        if table is None:
+            return False
+        index = self.conn.execute("SELECT sql FROM sqlite_master WHERE name = 'idx_disclosures_key'").fetchone()
+        info = self.conn.execute("PRAGMA table_info(disclosures)").fetchall()
+        columns = [r[1] for r in info]
+        types_match = all(COLUMN_TYPES[name] == declared for _, name, declared, *_ in info if name in PIT_COLUMNS)
+        if "UNIQUE" not in table[0] and types_match and index is not None and index[0] == _KEY_INDEX:
+            return False
+        shared = _quoted([c for c in PIT_COLUMNS if c in columns])
+        with self.conn:
+            self.conn.execute("ALTER TABLE disclosures RENAME TO disclosures_old")
+            for (name,) in self.conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'disclosures_old' "
+                    "AND sql IS NOT NULL").fetchall():
+                self.conn.execute(f'DROP INDEX "{name}"')
+        self.conn.executescript(_SCHEMA)
+        self.conn.execute(_KEY_INDEX)
+        with self.conn:
+            self.conn.execute(f"INSERT OR REPLACE INTO disclosures ({shared}) SELECT {shared} FROM disclosures_old")
+            self.conn.execute("DROP TABLE disclosures_old")
+        return True
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM disclosures").fetchone()[0]
+
+    def upsert(self, df):
+        """Insert or replace rows of an exported (string) PIT frame; returns the row count written."""
+        if df is None or df.empty:
+            return 0
+        columns = [c for c in PIT_COLUMNS if c in df.columns]
+        rows = [
+            tuple(_quantity(v, int if c in SHARE_COLUMNS else float) if c in QUANTITY_COLUMNS
+                  else ("" if pd.isna(v) else str(v))
+                  for c, v in zip(columns, values))
+            for values in df[columns].itertuples(index=False, name=None)
+        ]
+        placeholders = ", ".join("?" for _ in columns)
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO disclosures ({_quoted(columns)}) VALUES ({placeholders})",
+                rows,
+            )
+        return len(rows)
+
+    def import_csv(self, path):
+        """Upsert an exported CSV; returns how many rows the store gained."""
+        before = self.count()
+        self.upsert(pd.read_csv(path, dtype=str, keep_default_na=False))
+        return self.count() - before
+
+    def query(self, symbol=None, since=None, until=None, categories=None):
+        """Disclosures filtered by symbol, broadcast date range and person category, newest first."""
+        clauses, params = [], []
+        if symbol:
+            clauses.append("symbol = ?")
+            params.append(symbol.upper())
+        if since:
+            clauses.append("date >= ?")
+            params.append(since.strftime("%Y-%m-%d"))
+        if until:
+            clauses.append("date <= ?")
+            params.append(until.strftime("%Y-%m-%d"))
+        if categories:
+            clauses.append(f"personCategory IN ({', '.join('?' for _ in categories)})")
+            params.extend(categories)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return pd.read_sql_query(f"SELECT * FROM disclosures {where} ORDER BY date DESC", self.conn, params=params)
+
+    def net_buying(self, symbol=None, days=90, categories=PROMOTER_CATEGORIES, limit=None):
+        """Shares and value bought minus sold per symbol over the last `days` days.
+
+        Returns a frame with symbol, bought, sold, net_shares and net_value,
+        largest net buying first.
+        """
+        since = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+        params = [since, *categories]
+        symbol_clause = ""
+        if symbol:
+            symbol_clause = "AND symbol = ?"
+            params.append(symbol.upper())
+        sql = f"""
+            SELECT symbol,
+                   SUM(CASE WHEN tdpTransactionType = 'Buy' THEN secAcq ELSE 0 END) AS bought,
+                   SUM(CASE WHEN tdpTransactionType = 'Sell' THEN secAcq ELSE 0 END) AS sold,
+                   SUM(CASE tdpTransactionType WHEN 'Buy' THEN secAcq WHEN 'Sell' THEN -secAcq ELSE 0 END) AS net_shares,
+                   SUM(CASE tdpTransactionType WHEN 'Buy' THEN secVal WHEN 'Sell' THEN -secVal ELSE 0 END) AS net_value
+            FROM disclosures
+            WHERE date >= ? AND personCategory IN ({', '.join('?' for _ in categories)}) {symbol_clause}
+            GROUP BY symbol
+            ORDER BY net_value DESC
+        """
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return pd.read_sql_query(sql, self.conn, params=params)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the local insider-trading store")
+    parser.add_argument("command", choices=["net", "rows", "top", "import"])
+    parser.add_argument("target", nargs="?", help="SYMBOL, or a CSV path for import")
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args(argv)
+
+    with PitStore(args.db) as store:
+        if args.command == "import":
+            path = args.target or "InsiderTrading_Data.csv"
+            print(f"✅ Imported {store.import_csv(path)} new rows from {path} ({store.count()} stored)")
+        elif args.command == "top":
+            print(store.net_buying(days=args.days, limit=args.limit).to_string(index=False))
+        elif not args.target:
+            parser.error(f"{args.command} needs a SYMBOL")
+        elif args.command == "net":
+            result = store.net_buying(args.target, days=args.days)
+            if result.empty:
+                print(f"No promoter trades for {args.target.upper()} in the last {args.days} days")
+            else:
+                print(result.to_string(index=False))
+        else:
+            since = datetime.now() - timedelta(days=args.days)
+            print(store.query(args.target, since=since).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
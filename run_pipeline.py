@@ -0,0 +1,195 @@
+"""Run every report job in one process as a dependency graph.
+
+Jobs whose dependencies are done run concurrently on worker threads and
+share the process-wide Sheets client and HTTP session from shared_clients,
+so credentials are parsed and authorized once per run instead of once per
+script. A job whose dependency failed is skipped.
+
+Usage:
+    python run_pipeline.py                       # every job
+    python run_pipeline.py --only fpi_sectors,insider_trading
+    python run_pipeline.py --since participants  # participants and everything after it
+    python run_pipeline.py --list
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from dotenv import load_dotenv
+
+import metrics
+
+load_dotenv()
+
+
+# ================== JOBS ==================
+def run_participants(options):
+    import fiidiiparticipants
+    asyncio.run(fiidiiparticipants.main(incremental=not options.full))
+
+
+def run_fpi_sectors(options):
+    import FPI_Sectors
+    FPI_Sectors.main(full=options.full)
+
+
+def run_insider_trading(options):
+    import InsiderTrading
+    InsiderTrading.main(incremental=not options.full)
+
+
+def run_fii_telegram(options):
+    import FIIDII_Telegram
+    FIIDII_Telegram.main(local=options.local, drain_now=False)
+
+
+def run_cialist(options):
+    import CIAList_to_Tele
+    CIAList_to_Tele.main(new_only=options.new_only, drain_now=False)
+
+
+def run_telegram_drain(options):
+    from telegram_outbox import drain
+    token = os.getenv("TELEGRAM_BOT_TOKEN")
+    if not token:
+        print("⏭️ TELEGRAM_BOT_TOKEN is not set; leaving the outbox for later.")
+        return
+    if not drain(token):
+        raise RuntimeError("some posts are still pending in the outbox")
+
+
+class Job:
+    def __init__(self, name, func, deps=(), description=""):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.description = description
+
+
+# Reports read what the fetch jobs write, and the two Telegram producers only
+# enqueue so every post goes out through a single drain at the end
+JOBS = [
+    Job("participants", run_participants, description="NSE participant OI → store, sheet, CSV"),
+    Job("fpi_sectors", run_fpi_sectors, description="NSDL fortnightly FPI sector flows → sheet"),
+    Job("insider_trading", run_insider_trading, description="NSE PIT disclosures → store, sheet, CSV"),
+    Job("fii_telegram", run_fii_telegram, deps=["participants"], description="FII participants table → outbox"),
+    Job("cialist", run_cialist, description="CIA list rows for today → outbox"),
+    Job("telegram_drain", run_telegram_drain, deps=["fii_telegram", "cialist"],
+        description="Deliver queued Telegram posts"),
+]
+
+
+# ================== SELECTION ==================
+def downstream(names, jobs=JOBS):
+    """`names` plus every job that depends on them, directly or not."""
+    selected = set(names)
+    changed = True
+    while changed:
+        changed = False
+        for job in jobs:
+            if job.name not in selected and selected.intersection(job.deps):
+                selected.add(job.name)
+                changed = True
+    return selected
+
+
+def select_jobs(only=None, since=None, jobs=JOBS):
+    """Jobs to run, in registry order. Dependencies outside the selection count as done."""
+    names = [job.name for job in jobs]
+    for name in list(only or []) + ([since] if since else []):
+        if name not in names:
+            raise ValueError(f"Unknown job '{name}' (choose from {', '.join(names)})")
+    selected = set(names)
+    if only:
+        selected &= set(only)
+    if since:
+        selected &= downstream([since], jobs)
+    return [job for job in jobs if job.name in selected]
+
+
+# ================== RUNNER ==================
+def _run(job, options):
+    start = time.perf_counter()
+    try:
+        with metrics.stage(f"job:{job.name}"):
+            job.func(options)
+        return "ok", time.perf_counter() - start, None
+    except Exception as e:
+        return "failed", time.perf_counter() - start, e
+
+
+def run_jobs(jobs, options, max_workers=None):
+    """Run `jobs` as soon as their selected dependencies succeed; returns {name: (status, seconds, error)}."""
+    names = {job.name for job in jobs}
+    pending = {job.name: job for job in jobs}
+    results, running = {}, {}
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(jobs) or 1, thread_name_prefix="job") as pool:
+        while pending or running:
+            for name, job in list(pending.items()):
+                deps = [d for d in job.deps if d in names]
+                if any(results.get(d, ("",))[0] in ("failed", "skipped") for d in deps):
+                    del pending[name]
+                    results[name] = ("skipped", 0.0, None)
+                    print(f"⏭️ [{name}] skipped: a dependency did not succeed")
+                elif all(results.get(d, ("",))[0] == "ok" for d in deps):
+                    del pending[name]
+                    print(f"▶️ [{name}] started")
+                    running[pool.submit(_run, job, options)] = name
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name] = future.result()
+                status, seconds, error = results[name]
+                if error is None:
+                    print(f"✅ [{name}] finished in {seconds:.1f}s")
+                else:
+                    print(f"❌ [{name}] failed after {seconds:.1f}s: {error}")
+    return {job.name: results[job.name] for job in jobs}
+
+
+def print_summary(results, elapsed):
+    print("\n📋 Pipeline summary")
+    for name, (status, seconds, _) in results.items():
+        print(f"   {name:<16} {status:<8} {seconds:7.1f}s")
+    print(f"   {'total':<16} {'':<8} {elapsed:7.1f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the report jobs as one dependency graph")
+    parser.add_argument("--only", help="comma-separated jobs to run; their dependencies are not run")
+    parser.add_argument("--since", help="run this job and every job downstream of it")
+    parser.add_argument("--list", action="store_true", help="show the jobs and exit")
+    parser.add_argument("--workers", type=int, help="maximum jobs running at once")
+    parser.add_argument("--full", action="store_true", help="full refetch for the fetch jobs")
+    parser.add_argument("--local", action="store_true", help="build the FII table from the local store")
+    parser.add_argument("--new-only", action="store_true", default=os.getenv("CIALIST_NEW_ONLY") == "1",
+                        help="CIA list: only rows not delivered earlier today")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for job in JOBS:
+            after = f" (after {', '.join(job.deps)})" if job.deps else ""
+            print(f"{job.name:<16} {job.description}{after}")
+        return 0
+
+    only = [name.strip() for name in args.only.split(",") if name.strip()] if args.only else None
+    try:
+        jobs = select_jobs(only, args.since)
+    except ValueError as e:
+        parser.error(str(e))
+
+    start = time.perf_counter()
+    results = run_jobs(jobs, args, args.workers)
+    print_summary(results, time.perf_counter() - start)
+    metrics.write_report("pipeline")
+    return 0 if all(status == "ok" for status, _, _ in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
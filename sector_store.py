@@ -0,0 +1,46 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+
+STORE_DIR = os.getenv("SECTOR_STORE_DIR", "data/fpi_sectors")
+
+
+class SectorReportStore:
+    """Parsed NSDL fortnightly sector frames, one Parquet file per report date.
+
+    Files are named `report_date=YYYY-MM-DD.parquet`, so listing the
+    directory tells which fortnights are already parsed without opening them.
+    """
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, report_date):
+        return os.path.join(self.root, f"report_date={report_date.strftime('%Y-%m-%d')}.parquet")
+
+    def dates(self):
+        days = set()
+        for name in os.listdir(self.root):
+            if name.startswith("report_date=") and name.endswith(".parquet"):
+                days.add(datetime.strptime(name[12:22], "%Y-%m-%d").date())
+        return days
+
+    def __contains__(self, report_date):
+        return os.path.exists(self._path(report_date))
+
+    def put(self, report_date, df):
+        path = self._path(report_date)
+        tmp = path + ".tmp"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+
+    def get(self, report_date):
+        path = self._path(report_date)
+        return pd.read_parquet(path) if os.path.exists(path) else None
+
+    def read(self, report_dates):
+        """Concatenate the stored frames for the given dates (missing ones are skipped)."""
+        frames = [df for df in (self.get(d) for d in report_dates) if df is not None]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
@@ -0,0 +1,64 @@
+import json
+import os
+import threading
+
+import gspread
+import requests
+from google.oauth2.service_account import Credentials
+from requests.adapters import HTTPAdapter
+
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+
+# Re-entrant: factories call other getters (open_spreadsheet → get_gspread_client → get_credentials)
+_lock = threading.RLock()
+_cache = {}
+
+
+def _cached(name, factory):
+    """Build a process-wide object on first use and hand back the same one afterwards."""
+    if name not in _cache:
+        with _lock:
+            if name not in _cache:
+                _cache[name] = factory()
+    return _cache[name]
+
+
+def get_credentials():
+    """Service-account credentials parsed from GOOGLE_SHEETS_CREDENTIALS."""
+    def build():
+        credentials_json = os.getenv("GOOGLE_SHEETS_CREDENTIALS")
+        if not credentials_json:
+            raise ValueError("GOOGLE_SHEETS_CREDENTIALS environment variable is not set.")
+        return Credentials.from_service_account_info(json.loads(credentials_json), scopes=SCOPES)
+    return _cached("credentials", build)
+
+
+def get_gspread_client():
+    """Authorized gspread client shared by every script in this process."""
+    return _cached("gspread", lambda: gspread.authorize(get_credentials()))
+
+
+def open_spreadsheet(sheet_id):
+    return _cached(f"spreadsheet:{sheet_id}", lambda: get_gspread_client().open_by_key(sheet_id))
+
+
+def get_http_session():
+    """Keep-alive requests session with a pooled adapter for plain HTTP calls."""
+    def build():
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+    return _cached("http", build)
+
+
+def set_client(name, value):
+    """Override a cached client, e.g. with sheet_sync.MemoryClient() in tests."""
+    with _lock:
+        _cache[name] = value
+
+
+def reset():
+    with _lock:
+        _cache.clear()
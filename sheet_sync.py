@@ -0,0 +1,457 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import gspread
+import numpy as np
+from gspread.utils import a1_to_rowcol, absolute_range_name, rowcol_to_a1
+
+from metrics import count, timed
+
+STATE_DIR = os.getenv("SHEET_SYNC_STATE_DIR", ".cache/sheet_sync")
+
+# Stay well under the Sheets API request size limit per values.batchUpdate call
+MAX_REQUEST_BYTES = int(os.getenv("SHEETS_MAX_REQUEST_BYTES", str(2 * 1024 * 1024)))
+MAX_PARALLEL_WRITES = int(os.getenv("SHEETS_MAX_PARALLEL_WRITES", "4"))
+WRITE_RETRIES = 4
+RETRY_STATUSES = {429, 500, 502, 503}
+READ_FIELDS = "valueRanges(values)"  # Field mask: only cell values come back from batchGet
+
+
+# ================== SERIALIZATION ==================
+def frame_to_rows(df):
+    """DataFrame → list of row lists safe for the Sheets API (NaN/inf become '')."""
+    cleaned = df.replace([float("inf"), float("-inf")], None)
+    cleaned = cleaned.astype(object).where(cleaned.notna(), "")
+    return cleaned.values.tolist()
+
+
+def _cell_str(value):
+    # Sheets returns whole-number floats as ints, so compare them the same way
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def row_hash(row):
+    return hashlib.md5("\x1f".join(_cell_str(v) for v in row).encode("utf-8")).hexdigest()
+
+
+# ================== BULK WRITE ==================
+def _blocks(updates, max_bytes):
+    """Split range updates into row blocks and pack them into requests of at most max_bytes."""
+    requests_, current, size = [], [], 0
+    for item in updates:
+        r1, c1, _, _ = _parse_range(item["range"])
+        values = item["values"]
+        row_sizes = [len(json.dumps(row, default=str)) + 1 for row in values]
+        start = 0
+        while start < len(values):
+            end, block_size = start, 0
+            while end < len(values) and (end == start or block_size + row_sizes[end] <= max_bytes):
+                block_size += row_sizes[end]
+                end += 1
+            if current and size + block_size > max_bytes:
+                requests_.append(current)
+                current, size = [], 0
+            rng = f"{rowcol_to_a1(r1 + start, c1)}:{rowcol_to_a1(r1 + end - 1, c1 + max(len(r) for r in values[start:end]) - 1)}"
+            current.append({"range": rng, "values": values[start:end]})
+            size += block_size
+            start = end
+    if current:
+        requests_.append(current)
+    return requests_
+
+
+def _send_with_retry(worksheet, data, value_input_option):
+    body = {
+        "valueInputOption": value_input_option,
+        "data": [{"range": absolute_range_name(worksheet.title, d["range"]), "values": d["values"]} for d in data],
+    }
+    for attempt in range(WRITE_RETRIES + 1):
+        count("sheets_requests")
+        try:
+            return worksheet.spreadsheet.values_batch_update(body)
+        except gspread.exceptions.APIError as e:
+            status = getattr(e, "code", None)
+            if status not in RETRY_STATUSES or attempt == WRITE_RETRIES:
+                raise
+            delay = random.uniform(0, min(30, 2 ** attempt))
+            count("sheets_retries")
+            print(f"🔁 Sheets write {data[0]['range']} got {status}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def write_ranges(worksheet, updates, value_input_option="RAW",
+                 max_bytes=MAX_REQUEST_BYTES, max_workers=MAX_PARALLEL_WRITES):
+    """Send range updates as size-capped values.batchUpdate calls in parallel.
+
+    Each call is retried on its own, so one throttled block does not fail the
+    rest. Returns the number of API requests made.
+    """
+    requests_ = _blocks(updates, max_bytes)
+    if len(requests_) <= 1 or max_workers <= 1:
+        for data in requests_:
+            _send_with_retry(worksheet, data, value_input_option)
+        return len(requests_)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(_send_with_retry, worksheet, data, value_input_option) for data in requests_]
+        for f in futures:
+            f.result()
+    return len(requests_)
+
+
+def bulk_write(worksheet, df, value_input_option="RAW", max_bytes=MAX_REQUEST_BYTES,
+               max_workers=MAX_PARALLEL_WRITES):
+    """Write header + all rows of `df` from A1, resizing the grid once up front."""
+    rows = [[str(c) for c in df.columns]] + frame_to_rows(df)
+    width = len(df.columns)
+    if worksheet.row_count < len(rows) or worksheet.col_count < width:
+        worksheet.resize(rows=max(worksheet.row_count, len(rows)), cols=max(worksheet.col_count, width))
+    return write_ranges(worksheet, [{"range": "A1", "values": rows}], value_input_option, max_bytes, max_workers)
+
+
+# ================== SYNC STATE ==================
+def _state_path(worksheet, state_dir):
+    sheet_id = getattr(worksheet.spreadsheet, "id", "local")
+    return os.path.join(state_dir, f"{sheet_id}_{worksheet.title}.json")
+
+
+def _load_state(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_state(path, header, keys, hashes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"header": header, "keys": keys, "hashes": hashes}, f)
+
+
+def _state_from_sheet(worksheet, key_columns):
+    """Rebuild the sync state by reading the tab once."""
+    count("sheets_requests")
+    values = worksheet.get_all_values(value_render_option="UNFORMATTED_VALUE")
+    if not values:
+        return {"header": [], "keys": [], "hashes": []}
+    header = [str(h) for h in values[0]]
+    width = len(header)
+    rows = [row + [""] * (width - len(row)) for row in values[1:]]
+    # Trailing blank rows are just unused grid
+    while rows and not any(str(v) for v in rows[-1]):
+        rows.pop()
+    try:
+        key_idx = [header.index(k) for k in key_columns]
+    except ValueError:
+        key_idx = []
+    keys = [[_cell_str(row[i]) for i in key_idx] for row in rows]
+    return {"header": header, "keys": keys, "hashes": [row_hash(row) for row in rows]}
+
+
+# ================== DIFF ==================
+def _changed_runs(indices):
+    """Group sorted row indices into contiguous (start, end) runs."""
+    runs = []
+    for i in indices:
+        if runs and runs[-1][1] == i - 1:
+            runs[-1][1] = i
+        else:
+            runs.append([i, i])
+    return runs
+
+
+def _plan(old_keys, old_hashes, new_keys, new_hashes):
+    """Work out top deletions/insertions that realign old rows with new ones.
+
+    Returns (drop_top, insert_top); remaining differences are handled
+    positionally by the caller.
+    """
+    if old_keys and new_keys:
+        if new_keys[0] in old_keys:
+            return old_keys.index(new_keys[0]), 0
+        if old_keys[0] in new_keys:
+            return 0, new_keys.index(old_keys[0])
+    return 0, 0
+
+
+@timed()
+def sync_dataframe(worksheet, df, key_columns, value_input_option="RAW",
+                   state_dir=STATE_DIR, verify=False):
+    """Bring a worksheet in line with `df` sending only rows that differ.
+
+    Row 1 holds the header; rows are matched by `key_columns` plus a hash of
+    their content. The last synced state is kept in `state_dir` so steady-state
+    runs need no read; pass verify=True (or delete the state) to rebuild it
+    from the tab. Returns a dict describing what was sent.
+    """
+    header = [str(c) for c in df.columns]
+    rows = frame_to_rows(df)
+    key_idx = [header.index(k) for k in key_columns]
+    new_keys = [[_cell_str(row[i]) for i in key_idx] for row in rows]
+    new_hashes = [row_hash(row) for row in rows]
+    last_col = len(header)
+
+    path = _state_path(worksheet, state_dir)
+    state = None if verify else _load_state(path)
+    if state and state["keys"] and len(state["keys"][0]) != len(key_columns):
+        state = None  # Saved under a different key; rebuild it from the tab
+    if state is None:
+        state = _state_from_sheet(worksheet, key_columns)
+
+    report = {"deleted": 0, "inserted": 0, "updated": 0, "appended": 0, "cleared": 0, "rewritten": False}
+    try:
+        if state["header"] != header:
+            # Layout changed: overwrite in place, then blank whatever is left below
+            if worksheet.row_count < len(rows) + 1 or worksheet.col_count < last_col:
+                worksheet.resize(rows=max(worksheet.row_count, len(rows) + 1),
+                                 cols=max(worksheet.col_count, last_col))
+            write_ranges(worksheet, [{"range": "A1", "values": [header] + rows}], value_input_option)
+            old_rows = len(state["keys"])
+            old_width = max(len(state["header"]), last_col)
+            if old_rows > len(rows):
+                worksheet.batch_clear([f"A{len(rows) + 2}:{rowcol_to_a1(old_rows + 1, old_width)}"])
+            if len(state["header"]) > last_col:
+                worksheet.batch_clear([f"{rowcol_to_a1(1, last_col + 1)}:{rowcol_to_a1(old_rows + 1, old_width)}"])
+            report["rewritten"] = True
+            _save_state(path, header, new_keys, new_hashes)
+            return report
+
+        old_keys, old_hashes = list(state["keys"]), list(state["hashes"])
+        drop_top, insert_top = _plan(old_keys, old_hashes, new_keys, new_hashes)
+
+        if drop_top:
+            worksheet.delete_rows(2, drop_top + 1)
+            del old_keys[:drop_top], old_hashes[:drop_top]
+            report["deleted"] = drop_top
+        if insert_top:
+            worksheet.insert_rows(rows[:insert_top], row=2, value_input_option=value_input_option)
+            old_keys[:0], old_hashes[:0] = new_keys[:insert_top], new_hashes[:insert_top]
+            report["inserted"] = insert_top
+
+        overlap = min(len(old_keys), len(rows))
+        changed = [i for i in range(insert_top, overlap)
+                   if old_keys[i] != new_keys[i] or old_hashes[i] != new_hashes[i]]
+        changed += list(range(overlap, len(rows)))
+
+        if len(rows) + 1 > worksheet.row_count:
+            worksheet.resize(rows=len(rows) + 1)
+
+        updates = []
+        for start, end in _changed_runs(changed):
+            rng = f"{rowcol_to_a1(start + 2, 1)}:{rowcol_to_a1(end + 2, last_col)}"
+            updates.append({"range": rng, "values": rows[start:end + 1]})
+        if updates:
+            write_ranges(worksheet, updates, value_input_option)
+        report["appended"] = max(0, len(rows) - overlap)
+        report["updated"] = len(changed) - report["appended"]
+
+        if len(old_keys) > len(rows):
+            worksheet.batch_clear([f"A{len(rows) + 2}:{rowcol_to_a1(len(old_keys) + 1, last_col)}"])
+            report["cleared"] = len(old_keys) - len(rows)
+    except Exception:
+        # The tab may now be half-updated; force a re-read next time
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+    _save_state(path, header, new_keys, new_hashes)
+    return report
+
+
+def describe(report):
+    if report["rewritten"]:
+        return "full rewrite (header changed or first sync)"
+    parts = [f"{report[k]} {k}" for k in ("appended", "updated", "inserted", "deleted", "cleared") if report[k]]
+    return ", ".join(parts) if parts else "already up to date"
+
+
+# ================== BATCHED READS ==================
+def read_ranges(spreadsheet, ranges, value_render_option="FORMATTED_VALUE", major_dimension="ROWS"):
+    """Fetch several A1 ranges (e.g. "Sheet1!D30:J54") in one values.batchGet call.
+
+    Returns one list of rows (columns with major_dimension="COLUMNS") per
+    range, in request order, trimmed of trailing empty cells as the API does.
+    """
+    count("sheets_requests")
+    response = spreadsheet.values_batch_get(ranges, params={
+        "valueRenderOption": value_render_option,
+        "majorDimension": major_dimension,
+        "fields": READ_FIELDS,
+    })
+    value_ranges = response.get("valueRanges", [])
+    values = [vr.get("values", []) for vr in value_ranges]
+    return values + [[] for _ in range(len(ranges) - len(values))]
+
+
+def read_columns(spreadsheet, ranges, value_render_option="FORMATTED_VALUE"):
+    """Single-column ranges in one call, as equal-length string arrays padded with ''."""
+    columns = [c[0] if c else [] for c in read_ranges(spreadsheet, ranges, value_render_option, "COLUMNS")]
+    length = max((len(c) for c in columns), default=0)
+    return [np.array([str(v) for v in c] + [""] * (length - len(c)), dtype=str) for c in columns]
+
+
+# ================== IN-MEMORY STAND-IN ==================
+def _parse_range(a1, rows=None, cols=None):
+    """(r1, c1, r2, c2) for an A1 range; open ends like "A2:A" run to `rows`/`cols`."""
+    a1 = a1.split("!")[-1]
+    start, _, end = a1.partition(":")
+    r1, c1 = a1_to_rowcol(start)
+    if not end:
+        return r1, c1, r1, c1
+    if end.isalpha():
+        _, c2 = a1_to_rowcol(f"{end}1")
+        return r1, c1, rows, c2
+    if end.isdigit():
+        return r1, c1, int(end), cols
+    r2, c2 = a1_to_rowcol(end)
+    return r1, c1, r2, c2
+
+
+class MemoryWorksheet:
+    """Minimal gspread Worksheet stand-in that keeps values in a list of lists.
+
+    `calls` counts API-equivalent requests so syncs can be measured offline.
+    """
+
+    def __init__(self, title, spreadsheet=None, rows=1000, cols=26):
+        self.title = title
+        self.spreadsheet = spreadsheet
+        self.row_count = rows
+        self.col_count = cols
+        self.cells = {}
+        self.calls = {}
+
+    def _count(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def _write(self, r1, c1, values):
+        for i, row in enumerate(values):
+            for j, v in enumerate(row):
+                if v == "" or v is None:
+                    self.cells.pop((r1 + i, c1 + j), None)
+                else:
+                    self.cells[(r1 + i, c1 + j)] = v
+
+    def _values(self, a1, major_dimension="ROWS"):
+        n_rows = max((r for r, _ in self.cells), default=0)
+        n_cols = max((c for _, c in self.cells), default=0)
+        r1, c1, r2, c2 = _parse_range(a1, n_rows, n_cols)
+        grid = [[self.cells.get((r, c), "") for c in range(c1, c2 + 1)] for r in range(r1, r2 + 1)]
+        if major_dimension == "COLUMNS":
+            grid = [list(col) for col in zip(*grid)]
+        # Trim trailing empties the way the API does
+        grid = [row[:max((i + 1 for i, v in enumerate(row) if v != ""), default=0)] for row in grid]
+        while grid and not grid[-1]:
+            grid.pop()
+        return grid
+
+    def get_all_values(self, **kwargs):
+        self._count("get_all_values")
+        if not self.cells:
+            return []
+        n_rows = max(r for r, _ in self.cells)
+        n_cols = max(c for _, c in self.cells)
+        return [[self.cells.get((r, c), "") for c in range(1, n_cols + 1)] for r in range(1, n_rows + 1)]
+
+    def update(self, values=None, range_name="A1", **kwargs):
+        self._count("update")
+        r1, c1, _, _ = _parse_range(range_name)
+        self._write(r1, c1, values)
+
+    def batch_update(self, data, **kwargs):
+        self._count("batch_update")
+        for item in data:
+            r1, c1, _, _ = _parse_range(item["range"])
+            self._write(r1, c1, item["values"])
+
+    def batch_clear(self, ranges):
+        self._count("batch_clear")
+        for rng in ranges:
+            r1, c1, r2, c2 = _parse_range(rng)
+            for key in [k for k in self.cells if r1 <= k[0] <= r2 and c1 <= k[1] <= c2]:
+                del self.cells[key]
+
+    def clear(self):
+        self._count("clear")
+        self.cells = {}
+
+    def _shift(self, from_row, by):
+        moved = {}
+        for (r, c), v in self.cells.items():
+            moved[(r + by if r >= from_row else r, c)] = v
+        self.cells = moved
+
+    def insert_rows(self, values, row=1, **kwargs):
+        self._count("insert_rows")
+        self._shift(row, len(values))
+        self.row_count += len(values)
+        self._write(row, 1, values)
+
+    def delete_rows(self, start_index, end_index=None):
+        self._count("delete_rows")
+        end_index = end_index or start_index
+        n = end_index - start_index + 1
+        self.cells = {k: v for k, v in self.cells.items() if not start_index <= k[0] <= end_index}
+        self._shift(end_index + 1, -n)
+        self.row_count -= n
+
+    def resize(self, rows=None, cols=None):
+        self._count("resize")
+        self.row_count = rows or self.row_count
+        self.col_count = cols or self.col_count
+
+
+class MemorySpreadsheet:
+    def __init__(self, sheet_id="local"):
+        self.id = sheet_id
+        self.worksheets = {}
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def values_batch_update(self, body):
+        with self._lock:
+            for item in body["data"]:
+                title, _, a1 = item["range"].rpartition("!")
+                ws = self.worksheet(title.strip("'"))
+                ws._count("values_batch_update")
+                r1, c1, _, _ = _parse_range(a1)
+                ws._write(r1, c1, item["values"])
+        return {"totalUpdatedRows": sum(len(d["values"]) for d in body["data"])}
+
+    def values_batch_get(self, ranges, params=None):
+        params = params or {}
+        self.calls["values_batch_get"] = self.calls.get("values_batch_get", 0) + 1
+        value_ranges = []
+        for rng in ranges:
+            title, _, a1 = rng.rpartition("!")
+            ws = self.worksheet(title.strip("'"))
+            value_ranges.append({"values": ws._values(a1, params.get("majorDimension", "ROWS"))})
+        return {"valueRanges": value_ranges}
+
+    def worksheet(self, title):
+        if title not in self.worksheets:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return self.worksheets[title]
+
+    def add_worksheet(self, title, rows=1000, cols=26):
+        self.worksheets[title] = MemoryWorksheet(title, self, int(rows), int(cols))
+        return self.worksheets[title]
+
+
+class MemoryClient:
+    """Stand-in for an authorized gspread client: `open_by_key` returns in-memory spreadsheets."""
+
+    def __init__(self):
+        self.spreadsheets = {}
+
+    def open_by_key(self, key):
+        return self.spreadsheets.setdefault(key, MemorySpreadsheet(key))
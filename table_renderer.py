@@ -0,0 +1,130 @@
+"""Table image renderer for the FII participants Telegram post.
+
+Draws the same styled table as the original per-cell matplotlib loop, but
+the fill, font colour and weight of every cell are worked out up front as
+numpy matrices from the table values, and the figure is written straight
+to an in-memory PNG.
+"""
+import io
+from datetime import datetime
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt  # noqa: E402
+from matplotlib.collections import PatchCollection  # noqa: E402
+from matplotlib.patches import Rectangle  # noqa: E402
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import pytz  # noqa: E402
+
+from metrics import timed  # noqa: E402
+
+HEADER_FILL = "#FFA07A"     # Light orange headers
+LABEL_FILL = "#D3D3D3"      # Gray first column
+BEARISH_FILL = "#FF9999"    # Light red
+BULLISH_FILL = "#99FF99"    # Light green
+BLOCK_LABEL_FILL = "#ADD8E6"  # Light blue block title in column E
+BLOCK_ROW_FILL = "#FFFF99"  # Light yellow instrument labels in column E
+BLOCK_HEADER_FILL = "#D2B48C"  # Light brown block header cells
+GRID_COLOR = "#D3D3D3"
+TABLE_BBOX = (0, 0.05, 1, 0.90)  # Table area in axes coordinates, as in the original layout
+
+INTERPRETATION_COL = 5
+NUMERIC_COLS = [1, 2, 3, 6]           # Columns E, F, G, J get green/red by sign
+BLOCK_HEADER_ROWS = [0, 6, 12, 18]    # Data rows holding "Client"/"FII"/"PRO"/"DII" headers
+REVERSE_COLOR_ROWS = [4, 10, 16, 22]  # Index Put rows: positive is red
+DPI = 300
+STYLE_VERSION = 1  # Bump when the look changes so cached images are redrawn
+
+
+def style_matrix(df):
+    """Fill colour, text colour and bold mask for every cell, header row first.
+
+    Each is an array of shape (len(df) + 1, len(df.columns)).
+    """
+    n, m = df.shape
+    rows = np.arange(n)[:, None]
+    cols = np.arange(m)[None, :]
+
+    fill = np.full((n, m), "#FFFFFF", dtype=object)
+    block_header = np.isin(rows, BLOCK_HEADER_ROWS)
+    block_rows = ((1 <= rows) & (rows <= 5)) | ((7 <= rows) & (rows <= 10)) | \
+                 ((13 <= rows) & (rows <= 16)) | ((19 <= rows) & (rows <= 22))
+    fill = np.where((cols == 1) & block_rows, BLOCK_ROW_FILL, fill)
+    fill = np.where((cols == 1) & block_header, BLOCK_LABEL_FILL, fill)
+    fill = np.where(np.isin(cols, [2, 3, 4, 5]) & block_header, BLOCK_HEADER_FILL, fill)
+    if m > INTERPRETATION_COL:
+        interpretation = df.iloc[:, INTERPRETATION_COL].to_numpy()[:, None]
+        fill = np.where((cols == INTERPRETATION_COL) & (interpretation == "Bearish"), BEARISH_FILL, fill)
+        fill = np.where((cols == INTERPRETATION_COL) & (interpretation == "Bullish"), BULLISH_FILL, fill)
+        fill = np.where((cols == INTERPRETATION_COL) & ~np.isin(interpretation, ["Bearish", "Bullish"]), "#FFFFFF", fill)
+    fill[:, 0] = LABEL_FILL
+
+    values = df.apply(pd.to_numeric, errors="coerce").to_numpy(dtype="float64")
+    positive = values >= 0
+    reverse = np.isin(rows, REVERSE_COLOR_ROWS)
+    green = np.where(reverse, ~positive, positive)
+    color = np.where(green, "green", "red").astype(object)
+    color = np.where(np.isin(cols, NUMERIC_COLS) & ~np.isnan(values), color, "black")
+    color[:, 0] = "black"
+
+    bold = np.zeros((n, m), dtype=bool)
+    bold[:, 0] = True
+
+    header = lambda value, dtype=object: np.full((1, m), value, dtype=dtype)  # noqa: E731
+    return (np.vstack([header(HEADER_FILL), fill]),
+            np.vstack([header("black"), color]),
+            np.vstack([header(True, bool), bold]))
+
+
+def footer_text(now=None):
+    now = now or datetime.now(pytz.timezone("Asia/Kolkata"))  # Use IST for timestamp
+    return f"Generated by https://t.me/Nifty_BankNifty_Alerts | {now.strftime('%Y-%m-%d %H:%M:%S %Z')}"
+
+
+@timed()
+def render_table_png(df, footer=None, dpi=DPI):
+    """Render the styled table and return the PNG bytes.
+
+    The grid is drawn as one PatchCollection plus one centred text per
+    non-empty cell, laid out exactly where ax.table(bbox=TABLE_BBOX) puts
+    its cells, which skips matplotlib's per-cell Table bookkeeping.
+    """
+    fill, color, bold = style_matrix(df)
+    n, m = df.shape
+    text = np.vstack([np.asarray(df.columns, dtype=object)[None, :], df.to_numpy(dtype=object)])
+
+    fig, ax = plt.subplots(figsize=(min(12, m * 1.5), n * 0.5 + 0.5))
+    ax.axis("off")
+
+    x0, y0, width, height = TABLE_BBOX
+    cell_w, cell_h = width / m, height / (n + 1)
+    lefts = x0 + np.arange(m) * cell_w
+    bottoms = y0 + height - (np.arange(n + 1) + 1) * cell_h
+    cells = [Rectangle((left, bottom), cell_w, cell_h) for bottom in bottoms for left in lefts]
+    grid = ax.add_collection(PatchCollection(cells, facecolors=fill.ravel(), edgecolors=GRID_COLOR,
+                                             linewidths=0.5, transform=ax.transAxes, clip_on=False))
+    grid.set_in_layout(False)
+    grid.set_snap(True)
+
+    for i, j in zip(*np.nonzero(text.astype(str) != "")):
+        ax.text(lefts[j] + cell_w / 2, bottoms[i] + cell_h / 2, text[i, j], transform=ax.transAxes,
+                ha="center", va="center", fontsize=10, color=color[i, j],
+                fontweight="bold" if bold[i, j] else "normal", clip_on=False, in_layout=False)
+
+    fig.text(0.5, 0.02, footer or footer_text(), ha="center", va="bottom", fontsize=8,
+             color="black", bbox=dict(facecolor="#F0F0F0", edgecolor="none", pad=3))
+    fig.tight_layout()
+    if hasattr(fig, "set_layout_engine"):
+        # tight_layout leaves a placeholder engine behind (matplotlib >= 3.6), and
+        # savefig answers any engine with an extra full-DPI draw before the real one
+        fig.set_layout_engine("none")
+
+    # bbox_inches="tight" would draw the whole figure twice at full DPI; the
+    # tight box in inches comes out the same from the cheap screen-DPI renderer
+    bbox = fig.get_tightbbox(fig.canvas.get_renderer()).padded(0.1)
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=dpi, bbox_inches=bbox, facecolor="white")
+    plt.close(fig)
+    return buf.getvalue()
@@ -0,0 +1,171 @@
+import asyncio
+import os
+import random
+import re
+
+import aiohttp
+
+from metrics import count
+from nse_downloader import HostRateLimiter, TokenBucket
+
+API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+MAX_MESSAGE_CHARS = 4096
+# Telegram allows about 30 messages/s per bot overall and ~1/s into one chat
+GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "25"))
+PER_CHAT_RATE = float(os.getenv("TELEGRAM_PER_CHAT_RATE", "1"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+CODE_FENCE = ("```\n", "\n```")
+
+
+def chat_ids(value):
+    """Split a TELEGRAM_CHAT_IDS value ("-100123, -100456" or one per line) into chat ids."""
+    return [c for c in re.split(r"[\s,;]+", value or "") if c]
+
+
+# ================== CHUNKING ==================
+def pack_table(text, header_lines=2, limit=MAX_MESSAGE_CHARS, wrap=CODE_FENCE):
+    """Split an already-escaped text table into messages of at most `limit` characters.
+
+    Each message repeats the first `header_lines` lines and is wrapped in
+    `wrap` (a code fence by default); rows are packed greedily by their exact
+    length, so no chunk can exceed the limit. A single row longer than the
+    room left after the header is cut into pieces.
+    """
+    lines = text.split("\n")
+    header, rows = lines[:header_lines], lines[header_lines:]
+    prefix, suffix = wrap
+    base = len(prefix) + len("\n".join(header)) + len(suffix)
+    room = limit - base - (1 if header else 0)
+    if room <= 0:
+        raise ValueError(f"Header alone is {base} characters; nothing fits under {limit}")
+
+    pieces = []
+    for row in rows:
+        # Never cut an escape sequence in half: an odd run of backslashes
+        # before the cut means its last one escapes the next character
+        while len(row) > room:
+            slashes = len(row[:room]) - len(row[:room].rstrip("\\"))
+            cut = room - 1 if slashes % 2 else room
+            if cut == 0:
+                raise ValueError(f"An escape sequence needs 2 characters; only {room} fits under {limit}")
+            pieces.append(row[:cut])
+            row = row[cut:]
+        pieces.append(row)
+
+    chunks, current, size = [], [], 0
+    for piece in pieces:
+        extra = len(piece) + (1 if current else 0)
+        if current and size + extra > room:
+            chunks.append(current)
+            current, size = [], 0
+            extra = len(piece)
+        current.append(piece)
+        size += extra
+    if current or not chunks:
+        chunks.append(current)
+    return [prefix + "\n".join(header + chunk) + suffix for chunk in chunks]
+
+
+# ================== SENDER ==================
+class TelegramSender:
+    """Pooled async Bot API client that fans messages out to many chats.
+
+    Messages to one chat go out in order; different chats are served
+    concurrently. A global token bucket and a per-chat spacer keep within
+    Telegram's flood limits, and a 429 waits exactly the `retry_after` the
+    API asks for before trying again.
+    """
+
+    def __init__(self, token, retries=4, timeout=30, global_rate=GLOBAL_RATE, per_chat_rate=PER_CHAT_RATE,
+                 api_url=API_URL):
+        self.base = f"{api_url.rstrip('/')}/bot{token}"
+        self.retries = retries
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.global_limiter = TokenBucket(global_rate, capacity=max(1, int(global_rate)))
+        self.chat_limiter = HostRateLimiter(per_chat_rate)
+        self.stats = {"sent": 0, "retried": 0, "failed": 0}
+        self.session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=32, ttl_dns_cache=300, keepalive_timeout=30)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    def _form(self, fields):
+        if not any(isinstance(v, tuple) for v in fields.values()):
+            return fields
+        form = aiohttp.FormData()
+        for name, value in fields.items():
+            if isinstance(value, tuple):
+                filename, content, content_type = value
+                form.add_field(name, content, filename=filename, content_type=content_type)
+            else:
+                form.add_field(name, str(value))
+        return form
+
+    async def call(self, method, chat_id, **fields):
+        """POST one Bot API method for `chat_id`; returns True when Telegram accepted it.
+
+        File fields are given as (filename, bytes, content type) tuples.
+        """
+        fields = {"chat_id": chat_id, **{k: v for k, v in fields.items() if v is not None}}
+        for attempt in range(self.retries + 1):
+            await self.chat_limiter.wait(chat_id)
+            await self.global_limiter.wait()
+            retry_after = None
+            count("telegram_requests")
+            try:
+                async with self.session.post(f"{self.base}/{method}", data=self._form(fields)) as response:
+                    try:
+                        body = await response.json(content_type=None)
+                    except ValueError:
+                        body = {}
+                    if response.status == 200 and body.get("ok", True):
+                        self.stats["sent"] += 1
+                        return True
+                    reason = body.get("description") or f"HTTP {response.status}"
+                    if response.status not in RETRY_STATUSES:
+                        break
+                    retry_after = (body.get("parameters") or {}).get("retry_after")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                reason = str(e) or type(e).__name__
+
+            if attempt == self.retries:
+                break
+            self.stats["retried"] += 1
+            count("telegram_retries")
+            delay = float(retry_after) if retry_after else random.uniform(0, min(20, 0.5 * 2 ** attempt))
+            print(f"🔁 {method} to {chat_id} retry {attempt + 1}/{self.retries} in {delay:.1f}s ({reason})")
+            await asyncio.sleep(delay)
+
+        self.stats["failed"] += 1
+        print(f"❌ {method} to {chat_id} failed: {reason}")
+        return False
+
+    async def send_messages(self, chat_id, texts, parse_mode=None):
+        """Send texts to one chat in order, stopping at the first failure."""
+        for i, text in enumerate(texts, 1):
+            if not await self.call("sendMessage", chat_id, text=text, parse_mode=parse_mode):
+                print(f"❌ Stopped after chunk {i - 1}/{len(texts)} for chat {chat_id}")
+                return False
+        return True
+
+    async def fan_out(self, chats, texts, parse_mode=None):
+        """Send the same ordered texts to every chat concurrently; returns {chat_id: ok}."""
+        results = await asyncio.gather(*(self.send_messages(c, texts, parse_mode) for c in chats))
+        return dict(zip(chats, results))
+
+
+def deliver_texts(token, chats, texts, parse_mode=None):
+    """Blocking helper: send `texts` to every chat in `chats`; True when all chats got everything."""
+    async def run():
+        async with TelegramSender(token) as sender:
+            results = await sender.fan_out(chats, texts, parse_mode)
+            s = sender.stats
+            print(f"📬 {s['sent']} messages sent to {sum(results.values())}/{len(chats)} chats "
+                  f"({s['retried']} retried, {s['failed']} failed)")
+            return all(results.values())
+    return asyncio.run(run())
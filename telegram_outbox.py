@@ -0,0 +1,196 @@
+"""On-disk outbox for Telegram posts.
+
+Producers enqueue rendered messages and photos under an idempotency key
+(report + date + content hash + chat + chunk), so enqueueing the same post
+twice is a no-op and a rerun never sends it again. `drain` delivers
+everything due with TelegramSender, retrying failures with backoff on later
+drains.
+
+Usage:
+    python telegram_outbox.py drain     # deliver pending posts (TELEGRAM_BOT_TOKEN)
+    python telegram_outbox.py status    # counts by status
+"""
+import asyncio
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+
+from metrics import timed, write_report
+from telegram_delivery import TelegramSender
+
+OUTBOX_PATH = os.getenv("TELEGRAM_OUTBOX_PATH", ".cache/telegram_outbox.sqlite")
+MAX_ATTEMPTS = 6
+RETRY_BASE_SECONDS = 30  # Backoff between drains: 30s, 60s, 120s, ... capped at an hour
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    chat_id TEXT NOT NULL,
+    method TEXT NOT NULL,
+    text TEXT,
+    parse_mode TEXT,
+    photo BLOB,
+    filename TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created REAL NOT NULL,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt);
+"""
+
+
+def content_hash(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()[:16]
+
+
+class Outbox:
+    def __init__(self, path=OUTBOX_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _insert(self, rows):
+        now = time.time()
+        with self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO outbox (key, chat_id, method, text, parse_mode, photo, filename, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [row + (now,) for row in rows],
+            )
+            return self.conn.total_changes - before
+
+    def enqueue_texts(self, report, date, chats, texts, parse_mode=None):
+        """Queue ordered message chunks for every chat; returns how many were new."""
+        digest = content_hash(report, date, *texts)
+        return self._insert([
+            (f"{report}:{date}:{digest}:{chat}:{i}", chat, "sendMessage", text, parse_mode, None, None)
+            for chat in chats for i, text in enumerate(texts)
+        ])
+
+    def enqueue_photo(self, report, date, chats, png, caption=None, filename="image.png", content_key=None):
+        """Queue a photo for every chat. `content_key` replaces hashing the image bytes,
+        for images whose pixels change between renders of the same data."""
+        digest = content_hash(report, date, content_key or png, caption or "")
+        return self._insert([
+            (f"{report}:{date}:{digest}:{chat}:0", chat, "sendPhoto", caption, None, png, filename)
+            for chat in chats
+        ])
+
+    def due(self, now=None):
+        """Pending entries whose retry time has come, minus any queued behind a chat's backed-off entry."""
+        now = now or time.time()
+        return self.conn.execute(
+            "SELECT id, chat_id, method, text, parse_mode, photo, filename, attempts FROM outbox o "
+            "WHERE status = 'pending' AND next_attempt <= ? AND NOT EXISTS ("
+            "SELECT 1 FROM outbox w WHERE w.chat_id = o.chat_id AND w.id < o.id "
+            "AND w.status = 'pending' AND w.next_attempt > ?) ORDER BY id",
+            (now, now),
+        ).fetchall()
+
+    def mark_sent(self, ids):
+        with self.conn:
+            self.conn.executemany("UPDATE outbox SET status = 'sent', sent_at = ? WHERE id = ?",
+                                  [(time.time(), i) for i in ids])
+
+    def mark_failed(self, ids, error, max_attempts=MAX_ATTEMPTS):
+        now = time.time()
+        with self.conn:
+            for i in ids:
+                (attempts,) = self.conn.execute("SELECT attempts FROM outbox WHERE id = ?", (i,)).fetchone()
+                attempts += 1
+                status = "failed" if attempts >= max_attempts else "pending"
+                delay = min(3600, RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+                self.conn.execute(
+                    "UPDATE outbox SET attempts = ?, status = ?, next_attempt = ?, last_error = ? WHERE id = ?",
+                    (attempts, status, now + delay, error, i),
+                )
+
+    def counts(self):
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+
+    def prune(self, older_than_days=30):
+        with self.conn:
+            self.conn.execute("DELETE FROM outbox WHERE status = 'sent' AND sent_at < ?",
+                              (time.time() - older_than_days * 86400,))
+
+
+# ================== DRAIN ==================
+async def _drain_chat(sender, outbox, entries):
+    """Deliver one chat's entries in order; stop at the first failure so order is kept."""
+    sent = []
+    for entry_id, chat_id, method, text, parse_mode, photo, filename, _ in entries:
+        if method == "sendPhoto":
+            ok = await sender.call(method, chat_id, photo=(filename, photo, "image/png"), caption=text)
+        else:
+            ok = await sender.call(method, chat_id, text=text, parse_mode=parse_mode)
+        if not ok:
+            # Only the failed post is charged an attempt; the rest wait behind it untouched
+            outbox.mark_failed([entry_id], f"{method} failed")
+            break
+        sent.append(entry_id)
+        outbox.mark_sent([entry_id])
+    return len(sent)
+
+
+async def drain_async(token, path=OUTBOX_PATH, sender_retries=2):
+    with Outbox(path) as outbox:
+        entries = outbox.due()
+        if not entries:
+            return 0, 0
+        by_chat = {}
+        for entry in entries:
+            by_chat.setdefault(entry[1], []).append(entry)
+        async with TelegramSender(token, retries=sender_retries) as sender:
+            delivered = await asyncio.gather(*(_drain_chat(sender, outbox, e) for e in by_chat.values()))
+        outbox.prune()
+        return sum(delivered), len(entries)
+
+
+@timed()
+def drain(token, path=OUTBOX_PATH):
+    """Deliver every due post; returns True when nothing is left pending for now."""
+    delivered, due = asyncio.run(drain_async(token, path))
+    if due:
+        print(f"📬 Outbox: delivered {delivered}/{due} due post(s)")
+    return delivered == due
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    command = argv[0] if argv else "drain"
+    if command == "status":
+        with Outbox() as outbox:
+            print(outbox.counts() or "Outbox is empty")
+        return 0
+    token = os.getenv("TELEGRAM_BOT_TOKEN")
+    if not token:
+        print("❌ TELEGRAM_BOT_TOKEN is not set.")
+        return 1
+    return 0 if drain(token) else 1
+
+
+if __name__ == "__main__":
+    exit_code = main()
+    write_report("telegram_outbox")
+    sys.exit(exit_code)
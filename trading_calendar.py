@@ -0,0 +1,101 @@
+import json
+import os
+from datetime import date, datetime, timedelta
+
+# NSE equity/derivatives trading holidays (weekday closures only).
+# Extend for a new year here, or drop a JSON list of "YYYY-MM-DD" strings
+# at NSE_HOLIDAYS_FILE to add dates without touching the code.
+NSE_HOLIDAYS = {
+    2025: [
+        "2025-02-26",  # Mahashivratri
+        "2025-03-14",  # Holi
+        "2025-03-31",  # Id-Ul-Fitr
+        "2025-04-10",  # Shri Mahavir Jayanti
+        "2025-04-14",  # Dr. Baba Saheb Ambedkar Jayanti
+        "2025-04-18",  # Good Friday
+        "2025-05-01",  # Maharashtra Day
+        "2025-08-15",  # Independence Day
+        "2025-08-27",  # Ganesh Chaturthi
+        "2025-10-02",  # Mahatma Gandhi Jayanti / Dussehra
+        "2025-10-21",  # Diwali Laxmi Pujan
+        "2025-10-22",  # Balipratipada
+        "2025-11-05",  # Prakash Gurpurb Sri Guru Nanak Dev
+        "2025-12-25",  # Christmas
+    ],
+    2026: [
+        "2026-01-15",  # Municipal Corporation elections (Maharashtra)
+        "2026-01-26",  # Republic Day
+        "2026-03-03",  # Holi
+        "2026-03-26",  # Shri Ram Navami
+        "2026-03-31",  # Shri Mahavir Jayanti
+        "2026-04-03",  # Good Friday
+        "2026-04-14",  # Dr. Baba Saheb Ambedkar Jayanti
+        "2026-05-01",  # Maharashtra Day
+        "2026-05-28",  # Bakri Id
+        "2026-06-26",  # Muharram
+        "2026-09-14",  # Ganesh Chaturthi
+        "2026-10-02",  # Mahatma Gandhi Jayanti
+        "2026-10-20",  # Dussehra
+        "2026-11-10",  # Diwali Balipratipada
+        "2026-11-24",  # Prakash Gurpurb Sri Guru Nanak Dev
+        "2026-12-25",  # Christmas
+    ],
+}
+
+HOLIDAYS_FILE = os.getenv("NSE_HOLIDAYS_FILE", "nse_holidays.json")
+
+
+def _load_holidays():
+    days = {d for year in NSE_HOLIDAYS.values() for d in year}
+    if os.path.exists(HOLIDAYS_FILE):
+        try:
+            with open(HOLIDAYS_FILE) as f:
+                days.update(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"❌ Could not read {HOLIDAYS_FILE}: {e}")
+    return {datetime.strptime(d, "%Y-%m-%d").date() for d in days}
+
+
+HOLIDAYS = _load_holidays()
+
+
+def _as_date(d):
+    return d.date() if isinstance(d, datetime) else d
+
+
+def is_trading_day(d):
+    d = _as_date(d)
+    return d.weekday() < 5 and d not in HOLIDAYS
+
+
+def trading_days(start, end):
+    """All trading days from start to end, both inclusive, oldest first."""
+    current, end = _as_date(start), _as_date(end)
+    days = []
+    while current <= end:
+        if is_trading_day(current):
+            days.append(current)
+        current += timedelta(days=1)
+    return days
+
+
+def previous_trading_day(d):
+    """The last trading day strictly before d."""
+    d = _as_date(d) - timedelta(days=1)
+    while not is_trading_day(d):
+        d -= timedelta(days=1)
+    return d
+
+
+def next_trading_day(d):
+    """The first trading day strictly after d."""
+    d = _as_date(d) + timedelta(days=1)
+    while not is_trading_day(d):
+        d += timedelta(days=1)
+    return d
+
+
+def latest_trading_day(d=None):
+    """d itself if it is a trading day, otherwise the one before it."""
+    d = _as_date(d or date.today())
+    return d if is_trading_day(d) else previous_trading_day(d)
@@ -2,30 +2,16 @@ import aiohttp
 import asyncio
 import pandas as pd
 import io
-import os
-import json
-from datetime import date, timedelta
+from datetime import date
 from dateutil.relativedelta import relativedelta
 import gspread
-from google.auth.transport.requests import Request
-from google.oauth2.service_account import Credentials
-from google.auth.exceptions import RefreshError
+from trading_calendar import trading_days
+from sheet_sync import sync_dataframe, describe
+from shared_clients import open_spreadsheet
 
-# Fetch credentials and Sheet ID from environment variables
-credentials_json = os.getenv('GOOGLE_SHEETS_CREDENTIALS')  # JSON string
+# Sheet ID; credentials come from GOOGLE_SHEETS_CREDENTIALS on first upload
 SHEET_ID = "1IUChF0UFKMqVLxTI69lXBi-g48f-oTYqI1K9miipKgY"
 
-if not credentials_json:
-    raise ValueError("GOOGLE_SHEETS_CREDENTIALS environment variable is not set.")
-
-# Authenticate using the JSON string from environment
-credentials_info = json.loads(credentials_json)
-credentials = Credentials.from_service_account_info(
-    credentials_info,
-    scopes=["https://www.googleapis.com/auth/spreadsheets"]
-)
-client = gspread.authorize(credentials)
-
 # Function to download and parse CSV
 async def fetch_data(session, url, date):
     try:
@@ -49,16 +35,13 @@ async def main():
     end_date = date.today()
     start_date = end_date - relativedelta(months=6)
 
-    delta = timedelta(days=1)
-
     # Create a session for making requests
     async with aiohttp.ClientSession() as session:
         tasks = []
-        # Create tasks for each day's request between the start and end date
-        while start_date <= end_date:
-            csv_url = f'https://archives.nseindia.com/content/nsccl/fao_participant_oi_{start_date.strftime("%d%m%Y")}.csv'
-            tasks.append(fetch_data(session, csv_url, start_date))
-            start_date += delta
+        # Create tasks for each trading day between the start and end date
+        for day in trading_days(start_date, end_date):
+            csv_url = f'https://archives.nseindia.com/content/nsccl/fao_participant_oi_{day.strftime("%d%m%Y")}.csv'
+            tasks.append(fetch_data(session, csv_url, day))
 
         # Await all tasks and gather results
         results = await asyncio.gather(*tasks)
@@ -77,7 +60,7 @@ async def main():
 def upload_to_google_sheets(df):
     try:
         # Open the Google Sheet by ID
-        sheet = client.open_by_key(SHEET_ID)
+        sheet = open_spreadsheet(SHEET_ID)
         
         # Check if the "FiiDii_OI" tab exists
         try:
@@ -88,12 +71,9 @@ def upload_to_google_sheets(df):
             worksheet = sheet.add_worksheet(title="FiiDii_OI", rows="1000", cols="20")
             print("Tab 'FiiDii_OI' created.")
         
-        # Clear the existing content in the sheet (if necessary)
-        worksheet.clear()
-        
-        # Update with the new data from DataFrame
-        worksheet.update([df.columns.values.tolist()] + df.values.tolist())
-        print("Data successfully uploaded to Google Sheets.")
+        # Send only the rows that differ from what the tab already holds
+        report = sync_dataframe(worksheet, df, key_columns=['Date', 'Client Type'])
+        print(f"Data successfully uploaded to Google Sheets ({describe(report)}).")
     
     except Exception as e:
         print(f"Error uploading to Google Sheets: {e}")
@@ -108,4 +88,5 @@ def save_to_csv(df):
         print(f"Error saving to CSV: {e}")
 
 # Run the asynchronous main function
-asyncio.run(main())
+if __name__ == "__main__":
+    asyncio.run(main())